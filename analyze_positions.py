@@ -0,0 +1,169 @@
+"""
+Bulk position analysis with a trained bot: reads positions from a (possibly huge) FEN/EPD or PGN file and writes the bot's
+best move, its score and the position's feature vector for every one of them, as JSON lines.
+
+    python analyze_positions.py suite.epd --history history --generation 100 --depth 2 --workers 8 -o results.jsonl
+    python analyze_positions.py games.pgn --weights champion.json
+
+The input is streamed and only a bounded number of positions is ever in flight, so memory use doesn't grow with the file.
+Ties between equally scored moves go to the first move in python-chess's legal move order, so results are repeatable.
+"""
+
+import argparse
+import itertools
+import json
+import sys
+from concurrent.futures import ProcessPoolExecutor
+
+import chess
+import chess.pgn
+
+import search_and_score
+from play_a_game import rank_moves
+
+
+def add_weights_arguments(parser:argparse.ArgumentParser) -> None:
+    """
+    The options to pick a bot's weights, shared with the other command line tools.
+    """
+    source = parser.add_argument_group("weights", "Either a JSON file, or a bot from a history store (see history_store.py)")
+    source.add_argument("--weights", help="JSON file with a {weight name: value} dict")
+    source.add_argument("--history", help="History store directory")
+    source.add_argument("--generation", type=int, help="Generation to take the bot from (default: the last one)")
+    source.add_argument("--ident", type=int, help="Bot identifier (default: best fitness of the generation)")
+    source.add_argument("--bot-index", type=int, help="Bot index within the generation")
+
+
+def weights_from_args(args:argparse.Namespace) -> dict:
+    if args.weights:
+        with open(args.weights) as f:
+            weights = json.load(f)
+        missing = [name for name in search_and_score.WEIGHT_NAMES if name not in weights]
+        if missing:
+            raise ValueError(f"{args.weights} is missing weights: {', '.join(missing)}")
+        return weights
+    if args.history:
+        from history_store import HistoryStore
+        return HistoryStore(args.history).bot_weights(args.generation, ident=args.ident, bot_index=args.bot_index)
+    raise ValueError("Need either --weights or --history")
+
+
+def read_positions(path:str, pgn_positions:str="all"):
+    """
+    Yields (id, fen) for every position in the file, lazily.
+    .pgn files give every position of every game's mainline (or just the final one with pgn_positions="final"),
+    anything else is read as one FEN or EPD per line (blank lines and lines starting with # are skipped).
+    """
+    if path.endswith(".pgn"):
+        with open(path) as f:
+            for game_number in itertools.count(1):
+                game = chess.pgn.read_game(f)
+                if game is None:
+                    return
+                board = game.board()
+                if pgn_positions == "all":
+                    yield f"{game_number}:0", board.fen()
+                for ply, move in enumerate(game.mainline_moves(), 1):
+                    board.push(move)
+                    if pgn_positions == "all":
+                        yield f"{game_number}:{ply}", board.fen()
+                if pgn_positions == "final":
+                    yield str(game_number), board.fen()
+        return
+
+    with open(path) as f:
+        for line_number, line in enumerate(f, 1):
+            line = line.strip()
+            if not line or line.startswith("#"):
+                continue
+            if len(line.split()) >= 6 and line.split()[4].isdigit():
+                yield str(line_number), line # Full FEN
+            else:
+                board = chess.Board()
+                operations = board.set_epd(line)
+                yield str(operations.get("id", line_number)), board.fen()
+
+
+_weights = None
+_depth = 1
+
+
+def _init_analysis(weights:dict, depth:int, opening_book_path:str=None) -> None:
+    global _weights, _depth
+    _weights = weights
+    _depth = depth
+    if opening_book_path is not None:
+        from opening_book import OpeningBook
+        search_and_score.FEATURE_CACHES[:] = [OpeningBook(opening_book_path)]
+
+
+def analyze_position(fen:str, weights:dict, depth:int=1) -> dict:
+    """
+    Best move, its score and the feature vector (from the side to move's point of view) of one position.
+    best_move and score are None if the game is already over.
+    """
+    board = chess.Board(fen)
+    is_white = board.turn == chess.WHITE
+    result = {"fen": fen, "best_move": None, "score": None,
+              "features": [float(value) for value in search_and_score.position_features(board, is_white)]}
+    if not board.is_game_over():
+        move_scores, max_score = rank_moves(board, weights, search_depth=depth)
+        result["best_move"] = next(move for move, score in move_scores.items() if score == max_score)
+        result["score"] = max_score
+    return result
+
+
+def _analyze_batch(batch:list) -> list:
+    return [{"id": position_id, **analyze_position(fen, _weights, _depth)} for position_id, fen in batch]
+
+
+def analyze_stream(positions, weights:dict, depth:int=1, workers:int=1, batch_size:int=64, opening_book_path:str=None):
+    """
+    Yields analyze_position results (plus the position's "id") for an iterable of (id, fen), in input order.
+    With workers > 1 the positions are spread over a process pool, with at most 2 batches per worker in flight.
+    """
+    positions = iter(positions)
+    batches = iter(lambda: list(itertools.islice(positions, batch_size)), [])
+
+    if workers <= 1:
+        _init_analysis(weights, depth, opening_book_path)
+        for batch in batches:
+            yield from _analyze_batch(batch)
+        return
+
+    with ProcessPoolExecutor(workers, initializer=_init_analysis, initargs=(weights, depth, opening_book_path)) as pool:
+        in_flight = [pool.submit(_analyze_batch, batch) for batch in itertools.islice(batches, 2 * workers)]
+        while in_flight:
+            results = in_flight.pop(0).result()
+            next_batch = next(batches, None)
+            if next_batch is not None:
+                in_flight.append(pool.submit(_analyze_batch, next_batch))
+            yield from results
+
+
+def main(argv:list=None) -> None:
+    parser = argparse.ArgumentParser(description="Score every position of a FEN/EPD or PGN file with a bot's weights.")
+    parser.add_argument("input", help="FEN / EPD file (one position per line) or PGN file")
+    parser.add_argument("-o", "--output", help="Where to write the JSON lines (default: stdout)")
+    parser.add_argument("--depth", type=int, default=1, help="Search depth")
+    parser.add_argument("--workers", type=int, default=1, help="Processes to spread the positions over")
+    parser.add_argument("--batch-size", type=int, default=64, help="Positions per task sent to a worker")
+    parser.add_argument("--pgn-positions", choices=("all", "final"), default="all", help="Which positions of each PGN game to analyze")
+    parser.add_argument("--opening-book", help="Opening book directory to take known features from (see opening_book.py)")
+    add_weights_arguments(parser)
+    args = parser.parse_args(argv)
+
+    weights = weights_from_args(args)
+    positions = read_positions(args.input, args.pgn_positions)
+    out = open(args.output, "w") if args.output else sys.stdout
+    try:
+        for result in analyze_stream(positions, weights, depth=args.depth, workers=args.workers,
+                                     batch_size=args.batch_size, opening_book_path=args.opening_book):
+            out.write(json.dumps(result) + "\n")
+    finally:
+        if out is not sys.stdout:
+            out.close()
+
+
+if __name__ == "__main__":
+    main()
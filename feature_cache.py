@@ -0,0 +1,211 @@
+"""
+Position -> feature vector cache living in shared memory, so every tournament worker process profits from every
+position any of them evaluated (common openings and middlegames get evaluated over and over otherwise).
+
+Layout of the shared block, all plain numpy arrays on top of one multiprocessing.shared_memory segment:
+
+    keys       uint64[n_slots]              position_key of each slot, 0 means empty
+    features   float32[n_slots, n_features] the feature vector (every rule returns a small integer, so float32 is exact)
+    stats      uint64[MAX_PROCESSES, 3]     hits / misses / inserts, one row per attached process
+
+It is a fixed size open addressing table (linear probing, at most max_probes slots per key).
+Reads take no lock at all: a reader checks the key, copies the features, and checks the key again, and a writer
+always clears the key before touching the features, so a half written slot just looks like a miss.
+Inserts take one of n_stripes locks, chosen by slot, so writers only wait on each other when they hit the same stripe.
+When all probed slots are taken, the key's home slot gets overwritten (it's a cache, not a dictionary).
+
+Create it once in the main process (with the same multiprocessing context the worker pool uses, the stripe locks
+come from it), hand handle() to the workers through the pool initializer, and SharedFeatureCache.attach(handle) there.
+"""
+
+import multiprocessing as mp
+from collections import OrderedDict
+from multiprocessing import shared_memory
+
+import numpy as np
+
+from search_and_score import WEIGHT_NAMES
+
+
+MAX_PROCESSES = 256
+_HEADER_SLOTS = 1 # uint64 counter handing out the stats rows
+
+
+def _layout(n_slots:int, n_features:int) -> tuple:
+    header_bytes = 8 * _HEADER_SLOTS
+    keys_bytes = 8 * n_slots
+    features_bytes = 4 * n_slots * n_features
+    stats_bytes = 8 * MAX_PROCESSES * 3
+    return header_bytes, keys_bytes, features_bytes, stats_bytes
+
+
+class SharedFeatureCache:
+
+    def __init__(self, n_slots:int=1 << 18, n_features:int=len(WEIGHT_NAMES), n_stripes:int=64, max_probes:int=8,
+                 name:str=None, locks:list=None, create:bool=True, context=None):
+        if n_slots & (n_slots - 1):
+            raise ValueError("n_slots has to be a power of two")
+
+        self.n_slots = n_slots
+        self.n_features = n_features
+        self.max_probes = max_probes
+        context = context or mp.get_context()
+        self.locks = locks if locks is not None else [context.Lock() for _ in range(n_stripes)]
+        self._mask = n_slots - 1
+        self._owner = create
+
+        header_bytes, keys_bytes, features_bytes, stats_bytes = _layout(n_slots, n_features)
+        size = header_bytes + keys_bytes + features_bytes + stats_bytes
+        if create:
+            self.shm = shared_memory.SharedMemory(name=name, create=True, size=size)
+            self.shm.buf[:size] = bytes(size)
+        else:
+            self.shm = _attach_shared_memory(name)
+
+        buf = self.shm.buf
+        offset = 0
+        self._header = np.ndarray((_HEADER_SLOTS,), dtype=np.uint64, buffer=buf, offset=offset)
+        offset += header_bytes
+        self.keys = np.ndarray((n_slots,), dtype=np.uint64, buffer=buf, offset=offset)
+        offset += keys_bytes
+        self.features = np.ndarray((n_slots, n_features), dtype=np.float32, buffer=buf, offset=offset)
+        offset += features_bytes
+        self._stats = np.ndarray((MAX_PROCESSES, 3), dtype=np.uint64, buffer=buf, offset=offset)
+
+        # Every process gets its own stats row, so counting never needs a lock
+        with self.locks[0]:
+            self._row = int(self._header[0])
+            if self._row >= MAX_PROCESSES:
+                raise RuntimeError(f"More than {MAX_PROCESSES} processes attached to feature cache {self.shm.name}")
+            self._header[0] += 1
+        self._my_stats = self._stats[self._row]
+        self._final_stats = None # What stats() answers once the shared memory is gone
+
+    def handle(self) -> tuple:
+        """
+        Everything a worker needs to attach to this cache, picklable (pass it through the pool initializer).
+        """
+        return (self.shm.name, self.n_slots, self.n_features, self.max_probes, self.locks)
+
+    @classmethod
+    def attach(cls, handle:tuple) -> "SharedFeatureCache":
+        name, n_slots, n_features, max_probes, locks = handle
+        return cls(n_slots=n_slots, n_features=n_features, max_probes=max_probes, name=name, locks=locks, create=False)
+
+    def get(self, key:int):
+        """
+        The cached features for a position_key, or None. Never blocks.
+        """
+        key = key or 1 # 0 marks empty slots
+        keys = self.keys
+        slot = key & self._mask
+        for _ in range(self.max_probes):
+            stored = int(keys[slot])
+            if stored == key:
+                features = self.features[slot].tolist()
+                if int(keys[slot]) == key: # Still the same entry after copying, so nobody wrote over it meanwhile
+                    self._my_stats[0] += 1
+                    return features
+                break
+            if stored == 0:
+                break
+            slot = (slot + 1) & self._mask
+        self._my_stats[1] += 1
+        return None
+
+    def put(self, key:int, features:list) -> None:
+        """
+        Stores the features for a position_key. Takes the stripe lock of the slot it writes to.
+        """
+        key = key or 1
+        keys = self.keys
+        home = key & self._mask
+        slot = home
+        for _ in range(self.max_probes):
+            stored = int(keys[slot])
+            if stored == key:
+                return # Someone else was faster
+            if stored == 0:
+                break
+            slot = (slot + 1) & self._mask
+        else:
+            slot = home # Everything's taken, the home slot gets evicted
+
+        expected = int(keys[slot])
+        with self.locks[slot % len(self.locks)]:
+            if int(keys[slot]) != expected:
+                return # Another writer got to this slot first, not worth fighting over
+            keys[slot] = 0
+            self.features[slot] = features
+            keys[slot] = key
+        self._my_stats[2] += 1
+
+    def stats(self) -> dict:
+        """
+        Hits / misses / inserts summed over all processes, plus how full the table is. After close, the last numbers.
+        """
+        if self._final_stats is not None:
+            return self._final_stats
+        hits, misses, inserts = (int(value) for value in self._stats.sum(axis=0))
+        return {
+            "hits": hits,
+            "misses": misses,
+            "inserts": inserts,
+            "fill": float(np.count_nonzero(self.keys)) / self.n_slots,
+        }
+
+    def close(self) -> None:
+        if self._final_stats is not None:
+            return
+        # Kept for whoever reports on the cache after it's gone, like the run's last metrics snapshot
+        self._final_stats = self.stats()
+        # The numpy views have to go before the shared memory can be closed
+        del self._header, self.keys, self.features, self._stats, self._my_stats
+        self.shm.close()
+        if self._owner:
+            self.shm.unlink()
+
+
+class LocalFeatureCache:
+    """
+    The single process version: a plain least recently used dict, for long lived processes like the UCI engine.
+    Same get / put / stats interface, so it plugs into search_and_score.register_feature_cache the same way.
+    """
+
+    def __init__(self, max_entries:int=1 << 18):
+        self.max_entries = max_entries
+        self._entries = OrderedDict()
+        self.hits = 0
+        self.misses = 0
+
+    def get(self, key:int):
+        features = self._entries.get(key)
+        if features is None:
+            self.misses += 1
+            return None
+        self._entries.move_to_end(key)
+        self.hits += 1
+        return features
+
+    def put(self, key:int, features:list) -> None:
+        self._entries[key] = features
+        if len(self._entries) > self.max_entries:
+            self._entries.popitem(last=False)
+
+    def stats(self) -> dict:
+        return {"hits": self.hits, "misses": self.misses, "entries": len(self._entries)}
+
+    def __len__(self):
+        return len(self._entries)
+
+
+def _attach_shared_memory(name:str) -> shared_memory.SharedMemory:
+    """
+    Attaches to an existing segment. Only the process that created it unlinks it (see close).
+    """
+    try:
+        return shared_memory.SharedMemory(name=name, track=False) # Python 3.13+
+    except TypeError:
+        # Older Pythons register the segment with the resource tracker again, but pool workers share their parent's
+        # tracker, so that's a no-op and the creator's unlink still cleans it up
+        return shared_memory.SharedMemory(name=name)
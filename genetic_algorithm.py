@@ -12,8 +12,13 @@ What we will need:
 ## IMPORTS #####
 ################
 
+# Only the standard library up here: spawned worker processes import this module again, and benchmarks import it too,
+# neither of which should pay for chess / numpy / the history store. run() imports the rest.
+import argparse
+import contextlib
+import json
+import os
 import random as rng
-from play_a_game import play_game
 
 
 ####################
@@ -84,110 +89,361 @@ def how_is_baby_made(parent_1, parent_2, mutation_chance=0.01, mutation_min=-10,
     return child
 
 
+#####################
+## CONFIGURATION ####
+#####################
+
+# Every knob of a run. A JSON config file overrides these, and command line options override the file:
+#     python genetic_algorithm.py --config big_run.json --generations 10 --n-workers 8
+DEFAULT_CONFIG = {
+    "seed": 47, # Seed so we can repeat runs consistently, number suggested by a friend on discord
+
+    "n_pops": 200, # MUST BE EVEN
+    "n_purged": None, # Acts as more of a "minimum amount purged", None means half the population
+    "mut_chance": 0.01,
+    "mut_min": -10,
+    "mut_max": 10,
+
+    "depth": 1,
+    "generations": 100,
+    "n_fights": 2,
+
+    "replay_dir": "replays", # Every game gets stored here, one replay file per generation (see replay.py)
+    "history_dir": "history", # Columnar history of every generation (see history_store.py)
+    "history_flush_every": 1, # Generations to buffer before handing them to the history writer thread
+
+    "profile": False, # Time every rule and count nodes / leaves / moves, dumped once per generation (see profiling.py)
+    "profile_path": "profile.jsonl",
+
+    "metrics_path": "metrics.jsonl", # Rolling file of throughput numbers (see telemetry.py)
+    "metrics_port": None, # Set to a port number to serve the metrics in Prometheus format on http://127.0.0.1:<port>/metrics
+
+    "n_workers": 1, # More than 1 plays each generation's games in that many processes
+    "start_method": None, # How worker processes get started ("fork", "spawn", "forkserver"), None is the platform default
+    "feature_cache_slots": 1 << 18, # Position -> features cache shared by all processes (see feature_cache.py), 0 turns it off
+
+    # Remembering game results (see result_cache.py) only pays off if the same game can come up again, so the cache is
+    # only used with pairing_seeds (survivors' rematches within a run) or a result_cache_path (reruns of the same config)
+    "result_cache_entries": 1 << 16, # Games remembered, 0 turns the cache off completely
+    "result_cache_path": None, # File to keep the remembered games in across runs
+    "pairing_seeds": False, # Seed every game from who plays whom instead of a fresh seed, so the same pairing always plays the same game
+
+    "opening_book_path": "opening_book", # Precomputed opening position features (see opening_book.py), used if it exists, None (or "") to ignore it
+    "contribute_to_book": False, # Add this run's opening positions to the book once the run is done (costs ~20ms per game)
+    "book_harvest_plies": 12,
+}
+
+# Types of the options whose default is None, so the command line knows what to parse
+_NONE_DEFAULT_TYPES = {"n_purged": int, "metrics_port": int, "start_method": str, "result_cache_path": str}
+
+# Guesses for the dry run when there's no metrics file from an earlier run to take the real game length from
+ESTIMATED_PLIES_PER_GAME = 80
+ESTIMATED_BRANCHING_FACTOR = 30
+
+
+def load_config(path:str=None, overrides:dict=None) -> dict:
+    """
+    DEFAULT_CONFIG, updated with the JSON file at path (if any) and then with overrides. Unknown keys are an error,
+    so a typo doesn't silently run with the default.
+    """
+    config = dict(DEFAULT_CONFIG)
+    for source, values in ((path, _read_config_file(path) if path else {}), ("overrides", overrides or {})):
+        unknown = [key for key in values if key not in DEFAULT_CONFIG]
+        if unknown:
+            raise ValueError(f"Unknown config keys in {source}: {', '.join(unknown)}")
+        config.update(values)
+
+    if config["n_pops"] % 2:
+        raise ValueError(f"n_pops has to be even, got {config['n_pops']}")
+    if config["n_purged"] is None:
+        config["n_purged"] = config["n_pops"] // 2
+    return config
+
+
+def _read_config_file(path:str) -> dict:
+    with open(path) as f:
+        return json.load(f)
+
+
+def estimate_work(config:dict) -> dict:
+    """
+    Rough size of one generation: games are exact, evaluations (leaves scored) are games x plies x branching^depth.
+    Plies per game come from the metrics file of an earlier run if there is one, ESTIMATED_PLIES_PER_GAME otherwise.
+    """
+    games = config["n_pops"] // 2 * config["n_fights"]
+
+    plies_per_game = ESTIMATED_PLIES_PER_GAME
+    plies_source = "guess"
+    metrics_path = config["metrics_path"]
+    if metrics_path and os.path.exists(metrics_path):
+        with open(metrics_path) as f:
+            lines = f.read().splitlines()
+        if lines:
+            last = json.loads(lines[-1])
+            if last.get("games"):
+                plies_per_game = last["plies_per_game"]
+                plies_source = metrics_path
+
+    evaluations_per_ply = ESTIMATED_BRANCHING_FACTOR ** config["depth"]
+    return {
+        "games_per_generation": games,
+        "plies_per_game": plies_per_game,
+        "plies_per_game_source": plies_source,
+        "evaluations_per_generation": int(games * plies_per_game * evaluations_per_ply),
+        "games_total": games * config["generations"],
+        "evaluations_total": int(games * plies_per_game * evaluations_per_ply * config["generations"]),
+    }
+
+
+def format_estimate(config:dict, estimate:dict) -> str:
+    return "\n".join([
+        f"{config['generations']} generations of {config['n_pops']} bots, {config['n_fights']} fights each, search depth {config['depth']}",
+        f"Games per generation:       {estimate['games_per_generation']:,}",
+        f"Evaluations per generation: ~{estimate['evaluations_per_generation']:,} "
+        f"({estimate['plies_per_game']:.0f} plies/game from {estimate['plies_per_game_source']}, "
+        f"~{ESTIMATED_BRANCHING_FACTOR}^{config['depth']} leaves per ply)",
+        f"Whole run:                  {estimate['games_total']:,} games, ~{estimate['evaluations_total']:,} evaluations",
+    ])
+
+
 ##############################
 ## THE GENETIC ALGORITHM #####
 ##############################
 
-seed = 47 # Seed so we can repeat runs consistently, number suggested by a friend on discord
-rng.seed(seed)
-
-# Lets get bots first uwu
-bots = []
-
-n_pops = 200 # MUST BE EVEN
-n_purged = n_pops // 2 # Acts as more of a "minimum amount purged"
-mut_chance = 0.01
-mut_min = -10
-mut_max = 10
-
-depth = 1
-generations = 100
-n_fights = 2
-
-# Create history csv with header if it doesn't exist yet, we're using semicolon separation
-with open(f"history.csv", "w") as f:
-    f.write("Generation;Bot Index;Bot Identifier;Score;Fitness;Overall Ranking;Weights\n")
-
-# We now initialize the population of chess bots
-# But we store them as dicts so we can keep track of their scores
-# (might be a hassle to reset said scores later, but that is a problem for future quirin)
-for _ in range(n_pops):
-    bot = {
-        "score": {"win":0, "loss":0, "draw":0},
-        "weights": {key: rng.uniform(-100, 100) for key in weights.keys()},
-        "fitness": 0,
-        "ranking": 0, # In case one bot manages to survive multiple generations, we can see it's overall performance uwu
-        "ident": rng.randint(0, 1_000_000)
-    }
-    bots.append(bot)
+def run(config:dict=None) -> list:
+    """
+    Runs the whole evolution with the given config (see DEFAULT_CONFIG and load_config) and returns the final population.
+    """
+    import glob
+    import multiprocessing as mp
+    from play_a_game import init_worker, play_game_task
+    from replay import ReplayWriter
+    from history_store import HistoryWriter
+    import profiling
+    from telemetry import Telemetry
+    import search_and_score
+    from feature_cache import SharedFeatureCache
+    import opening_book
+    from result_cache import ResultCache, pairing_seed, play_cached
 
-for gen in range(generations):
-    print(f"Generation {gen + 1} / {generations}")
+    config = load_config(overrides=config)
+    n_pops = config["n_pops"]
+    n_purged = config["n_purged"]
+    depth = config["depth"]
+    generations = config["generations"]
+    n_fights = config["n_fights"]
+    replay_dir = config["replay_dir"]
+    profile = config["profile"]
+    profile_path = config["profile_path"]
+    opening_book_path = config["opening_book_path"] or None # "" from the command line means no book too
 
-    # To ensure each bot fights a set amount of times, we will fold the list, ensuring each bot only fights once per matchup
-    bot_indexes = list(range(len(bots)))
-    generation_white_indexes = bot_indexes[::2]
-    generation_black_indexes = bot_indexes[1::2]
-    folded_population_index = list(zip(generation_white_indexes, generation_black_indexes))
-    
-    print("Murder is afoot...")
-    for fight in range(n_fights):
-        rng.shuffle(bots)
-        
-        for b_1_ind, b_2_ind in folded_population_index:
-            result = play_game(bots[b_1_ind]["weights"], bots[b_2_ind]["weights"], search_depth=depth)[0]
-            if result == 0:
-                bots[b_1_ind]["score"]["win"] += 1
-                bots[b_2_ind]["score"]["loss"] += 1
-            elif result == 1:
-                bots[b_1_ind]["score"]["loss"] += 1
-                bots[b_2_ind]["score"]["win"] += 1
-                
+    rng.seed(config["seed"])
+
+    # Replays of an earlier run in the same directory would no longer line up with the fresh history
+    for old_replay in glob.glob(f"{replay_dir}/gen_*.gcr") + glob.glob(f"{replay_dir}/gen_*.gcr.idx"):
+        os.remove(old_replay)
+
+    # Everything the run sets up gets torn down on the way out, also on errors and Ctrl-C, so no worker processes,
+    # shared memory or patched search functions outlive the run (benchmarks call run() again from the same process).
+    # Teardown goes in reverse order of setup, so the pool and the shared memory go first, before the closes that can
+    # fail (a full disk under the history writer), and every step runs even if an earlier one raised.
+    finished = False
+    with contextlib.ExitStack() as cleanup:
+        cleanup.callback(search_and_score.FEATURE_CACHES.clear)
+
+        # Start a fresh history store for this run, written in a background thread so the tournament never waits on the disk
+        history = cleanup.enter_context(HistoryWriter(config["history_dir"], overwrite=True, background=True,
+                                                      flush_every=config["history_flush_every"]))
+
+        if profile:
+            profiling.enable()
+            cleanup.callback(profiling.disable)
+            open(profile_path, "w").close() # Fresh profile for a fresh run
+
+        telemetry = Telemetry(generations, metrics_path=config["metrics_path"], http_port=config["metrics_port"])
+        cleanup.callback(telemetry.close)
+
+        mp_context = mp.get_context(config["start_method"])
+
+        # The book answers first, it's only loaded (memory mapped) once a position is actually looked up
+        use_book = opening_book_path is not None and os.path.isdir(opening_book_path)
+        if use_book:
+            book = opening_book.OpeningBook(opening_book_path)
+            search_and_score.register_feature_cache(book)
+            telemetry.register_cache("opening_book", book.stats)
+
+        feature_cache = None
+        if config["feature_cache_slots"]:
+            feature_cache = SharedFeatureCache(config["feature_cache_slots"], context=mp_context)
+            cleanup.callback(feature_cache.close)
+            search_and_score.register_feature_cache(feature_cache)
+            telemetry.register_cache("features", feature_cache.stats)
+
+        result_cache = None
+        if config["result_cache_entries"] and (config["pairing_seeds"] or config["result_cache_path"]):
+            result_cache = cleanup.enter_context(ResultCache(config["result_cache_entries"], path=config["result_cache_path"] or None))
+            telemetry.register_cache("results", result_cache.stats)
+
+        pool = None
+        if config["n_workers"] > 1:
+            pool = mp_context.Pool(config["n_workers"], initializer=init_worker,
+                           initargs=(feature_cache.handle() if feature_cache else None, profile, opening_book_path if use_book else None))
+
+            def stop_pool():
+                # A clean finish lets the workers exit, anything else kills them
+                if finished:
+                    pool.close()
+                else:
+                    pool.terminate()
+                pool.join()
+            cleanup.callback(stop_pool)
+
+        # We now initialize the population of chess bots
+        # But we store them as dicts so we can keep track of their scores
+        # (might be a hassle to reset said scores later, but that is a problem for future quirin)
+        bots = []
+        for _ in range(n_pops):
+            bot = {
+                "score": {"win":0, "loss":0, "draw":0},
+                "weights": {key: rng.uniform(-100, 100) for key in weights.keys()},
+                "fitness": 0,
+                "ranking": 0, # In case one bot manages to survive multiple generations, we can see it's overall performance uwu
+                "ident": rng.randint(0, 1_000_000)
+            }
+            bots.append(bot)
+
+        replay_paths = [] # Only this run's games go into the opening book
+        for gen in range(generations):
+            print(f"Generation {gen + 1} / {generations}")
+            telemetry.start_generation(gen + 1)
+
+            # To ensure each bot fights a set amount of times, we will fold the list, ensuring each bot only fights once per matchup
+            bot_indexes = list(range(len(bots)))
+            generation_white_indexes = bot_indexes[::2]
+            generation_black_indexes = bot_indexes[1::2]
+            folded_population_index = list(zip(generation_white_indexes, generation_black_indexes))
+
+            print("Murder is afoot...")
+            replay_path = f"{replay_dir}/gen_{gen + 1:04d}.gcr"
+            replay_paths.append(replay_path)
+            with ReplayWriter(replay_path, overwrite=True) as replays: # A rerun replaces the old run's games, like the history
+                for fight in range(n_fights):
+                    rng.shuffle(bots)
+
+                    # Draw all the game seeds up front, so the run is the same no matter how many workers play the games
+                    tasks = [(bots[b_1_ind]["weights"], bots[b_2_ind]["weights"], depth, rng.getrandbits(32)) for b_1_ind, b_2_ind in folded_population_index]
+                    if config["pairing_seeds"]:
+                        tasks = [(weights_1, weights_2, depth, pairing_seed(config["seed"], weights_1, weights_2)) for weights_1, weights_2, _, _ in tasks]
+
+                    def play_many(tasks):
+                        return pool.imap(play_game_task, tasks) if pool is not None else map(play_game_task, tasks)
+                    results = play_cached(result_cache, tasks, play_many) if result_cache is not None else play_many(tasks)
+
+                    for (b_1_ind, b_2_ind), task, (result, moves, game_stats, worker_profile) in zip(folded_population_index, tasks, results):
+                        game_seed = task[3]
+                        telemetry.record_game(game_stats["plies"], game_stats["nodes"])
+                        replays.append(moves, bots[b_1_ind]["ident"], bots[b_2_ind]["ident"], game_seed, result)
+                        if worker_profile is not None:
+                            profiling.merge(worker_profile)
+                        if "opening_book" in game_stats:
+                            book.merge_stats(game_stats["opening_book"])
+                        if profile:
+                            profiling.record_game(len(moves))
+                        if result == 0:
+                            bots[b_1_ind]["score"]["win"] += 1
+                            bots[b_2_ind]["score"]["loss"] += 1
+                        elif result == 1:
+                            bots[b_1_ind]["score"]["loss"] += 1
+                            bots[b_2_ind]["score"]["win"] += 1
+
+                        else:
+                            bots[b_1_ind]["score"]["draw"] += 1
+                            bots[b_2_ind]["score"]["draw"] += 1
+            telemetry.end_generation()
+            print(telemetry.format_generation())
+
+            if profile:
+                generation_profile = profiling.snapshot(reset_after=True)
+                profiling.dump(profile_path, gen + 1, generation_profile)
+                print(profiling.format_report(generation_profile, top=5))
+
+            # Fitness score time! :D
+            for bot in bots:
+                fitness = (bot["score"]["win"] * 2) + (bot["score"]["loss"] * -1) + bot["score"]["draw"]
+                bot["fitness"] = fitness
+                bot["ranking"] += fitness
+
+            # Time to cull the population
+            bots.sort(key=lambda x: x["fitness"], reverse=True)
+            evaluated = bots # The history summary describes everyone who played this generation, culled bots included
+            # We could purge all with negative fitness, and then randomly select the remaining bots to be purged :)
+            survivors_purge_1 = []
+            for bot in bots:
+                if bot["fitness"] >= 0:
+                    survivors_purge_1.append(bot)
+
+            # And now the remainder
+            if len(survivors_purge_1) > (n_pops - n_purged):
+                survivors_purge_2 = rng.sample(survivors_purge_1, k=(n_pops - n_purged))
             else:
-                bots[b_1_ind]["score"]["draw"] += 1
-                bots[b_2_ind]["score"]["draw"] += 1
-    
-    # Fitness score time! :D
-    for bot in bots:
-        fitness = (bot["score"]["win"] * 2) + (bot["score"]["loss"] * -1) + bot["score"]["draw"]
-        bot["fitness"] = fitness
-        bot["ranking"] += fitness
-    
-    # Time to cull the population
-    bots.sort(key=lambda x: x["fitness"], reverse=True)
-    # We could purge all with negative fitness, and then randomly select the remaining bots to be purged :)
-    survivors_purge_1 = []
-    for bot in bots:
-        if bot["fitness"] >= 0:
-            survivors_purge_1.append(bot)
-    
-    # And now the remainder
-    if len(survivors_purge_1) > (n_pops - n_purged):
-        survivors_purge_2 = rng.sample(survivors_purge_1, k=(n_pops - n_purged))
-    
-    
-    print("The survivors keep living...")
-    # Nature is healing (aka time to reproduce UwU)
-    bots = survivors_purge_2
-    while len(bots) < n_pops:
-        parent_1, parent_2 = rng.sample(bots, k=2)
-        child_weights = how_is_baby_made(parent_1["weights"], parent_2["weights"], mutation_chance=mut_chance, mutation_min=mut_min, mutation_max=mut_max)
-        child_bot = {
-            "score": {"win":0, "loss":0, "draw":0},
-            "weights": child_weights,
-            "fitness": 0,
-            "ranking": 0,
-            "ident": rng.randint(0, 1_000_000)
-        }
-        bots.append(child_bot)
-    
-    assert len(bots) == n_pops
+                survivors_purge_2 = survivors_purge_1 # Few enough made it that they all get to stay
 
-    with open(f"history.csv", "a") as f:
-        for index, bot in enumerate(bots):
-            f.write(f"{gen + 1};{index};{bot['ident']};{bot['score']};{bot['fitness']};{bot['ranking']};{bot['weights']}\n")
-    
-    # Now that the generation is over, reset all scores for the next generation
-    for bot in bots:
-        bot["fitness"] = 0
-        bot["score"] = {"win":0, "loss":0, "draw":0}
+
+            print("The survivors keep living...")
+            # Nature is healing (aka time to reproduce UwU)
+            bots = survivors_purge_2
+            while len(bots) < n_pops:
+                parent_1, parent_2 = rng.sample(bots, k=2)
+                child_weights = how_is_baby_made(parent_1["weights"], parent_2["weights"], mutation_chance=config["mut_chance"],
+                                                 mutation_min=config["mut_min"], mutation_max=config["mut_max"])
+                child_bot = {
+                    "score": {"win":0, "loss":0, "draw":0},
+                    "weights": child_weights,
+                    "fitness": 0,
+                    "ranking": 0,
+                    "ident": rng.randint(0, 1_000_000)
+                }
+                bots.append(child_bot)
+
+            assert len(bots) == n_pops
+
+            history.append_generation(gen + 1, bots, evaluated=evaluated)
+
+            # Now that the generation is over, reset all scores for the next generation
+            for bot in bots:
+                bot["fitness"] = 0
+                bot["score"] = {"win":0, "loss":0, "draw":0}
+        finished = True
+
+    if opening_book_path is not None and config["contribute_to_book"]:
+        print("Adding this run's openings to the book...")
+        added = opening_book.harvest(opening_book_path, replay_paths, max_plies=config["book_harvest_plies"])
+        print(f"{added} new book entries")
+
+    return bots
+
+
+def main(argv:list=None) -> None:
+    parser = argparse.ArgumentParser(description="Evolve chess bots. Every DEFAULT_CONFIG key is also an option, e.g. --n-pops 50.")
+    parser.add_argument("--config", help="JSON file with config values (see DEFAULT_CONFIG)")
+    parser.add_argument("--dry-run", action="store_true", help="Print the games and evaluations a generation will take, then stop")
+    for key, default in DEFAULT_CONFIG.items():
+        flag = "--" + key.replace("_", "-")
+        if isinstance(default, bool):
+            parser.add_argument(flag, dest=key, action=argparse.BooleanOptionalAction, default=None)
+        else:
+            parser.add_argument(flag, dest=key, type=_NONE_DEFAULT_TYPES.get(key, type(default)), default=None,
+                                help=f"(default: {default})")
+    args = parser.parse_args(argv)
+
+    overrides = {key: getattr(args, key) for key in DEFAULT_CONFIG if getattr(args, key) is not None}
+    config = load_config(args.config, overrides)
+
+    print(format_estimate(config, estimate_work(config)))
+    if args.dry_run:
+        return
+    run(config)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,614 @@
+"""
+Columnar history of a GA run, replacing history.csv with its stringified dicts.
+
+A history store is a directory with one raw binary file per column (every W/L/D count, fitness, ranking and every weight
+gets its own column), plus a manifest.json that knows the dtypes and which rows belong to which generation:
+
+    history/
+        manifest.json
+        generation.col
+        fitness.col
+        friendly_pawn_count.col
+        ...
+
+Writing a generation just appends to the column files, and reading memory maps them, so loading a run
+(or only a few columns of it, or only some generations) doesn't parse anything at all.
+Rows past what the manifest knows about (say the run got killed mid write) are ignored, and cut off on the next write.
+
+Every appended generation also gets a summary row (per weight mean, std, quantiles, histogram and correlation with fitness)
+in the summary_*.col files. Those are tiny no matter how big the population is, so plots can be drawn from them instantly.
+The rows of a generation are the population after culling and reproduction (what goes on to the next generation), but its
+summary describes the population that was actually evaluated, the bots the fitness was measured on, before the cull.
+"""
+
+import atexit
+import json
+import os
+import queue
+import threading
+
+import numpy as np
+
+from search_and_score import WEIGHT_NAMES
+
+
+MANIFEST_NAME = "manifest.json"
+FORMAT_VERSION = 1
+
+# Everything except the weights. The weights are all float64 columns named after the weight itself
+BOT_COLUMNS = {
+    "generation": "<i4",
+    "bot_index": "<i4",
+    "ident": "<i8",
+    "win": "<i4",
+    "loss": "<i4",
+    "draw": "<i4",
+    "fitness": "<i4",
+    "ranking": "<i8",
+}
+
+
+# Per generation summary statistics, see summarize()
+SUMMARY_QUANTILES = (0.05, 0.25, 0.5, 0.75, 0.95)
+SUMMARY_HIST_EDGES = tuple(np.linspace(-100, 100, 21)) # Weights always live in [-100, 100]
+
+
+def _summary_layout(n_weights:int) -> dict:
+    """
+    summary field -> (dtype, shape of one generation's row)
+    """
+    return {
+        "generation": ("<i4", ()),
+        "n_bots": ("<i4", ()),
+        "fitness_mean": ("<f8", ()),
+        "fitness_std": ("<f8", ()),
+        "fitness_max": ("<f8", ()),
+        "mean": ("<f8", (n_weights,)),
+        "std": ("<f8", (n_weights,)),
+        "quantiles": ("<f8", (n_weights, len(SUMMARY_QUANTILES))),
+        "hist": ("<i4", (n_weights, len(SUMMARY_HIST_EDGES) - 1)),
+        "fitness_corr": ("<f8", (n_weights,)),
+    }
+
+
+def summarize(columns:dict, weight_names:tuple=WEIGHT_NAMES) -> dict:
+    """
+    Boils one generation (dict of column name -> array) down to its summary row.
+    Bots that haven't played a game (children born after the cull, with their fitness of 0) are left out when there are
+    win / loss / draw columns, so rows stored after reproduction summarize the evaluated survivors at least.
+    Correlation with fitness is NaN for generations where fitness (or a weight) didn't vary at all.
+    """
+    played = slice(None)
+    if all(column in columns for column in ("win", "loss", "draw")):
+        games = np.asarray(columns["win"]) + np.asarray(columns["loss"]) + np.asarray(columns["draw"])
+        if games.any():
+            played = games > 0
+    weights = np.column_stack([np.asarray(columns[name], dtype=float)[played] for name in weight_names])
+    fitness = np.asarray(columns["fitness"], dtype=float)[played]
+
+    # Pearson correlation of every weight with fitness in one go
+    centered_weights = weights - weights.mean(axis=0)
+    centered_fitness = fitness - fitness.mean()
+    with np.errstate(divide="ignore", invalid="ignore"):
+        corr = (centered_weights.T @ centered_fitness) / (np.sqrt((centered_weights ** 2).sum(axis=0)) * np.sqrt((centered_fitness ** 2).sum()))
+
+    edges = np.asarray(SUMMARY_HIST_EDGES)
+    clipped = np.clip(weights, edges[0], edges[-1])
+    hist = np.stack([np.histogram(clipped[:, i], bins=edges)[0] for i in range(len(weight_names))])
+
+    return {
+        "generation": columns["generation"][0],
+        "n_bots": len(fitness),
+        "fitness_mean": fitness.mean(),
+        "fitness_std": fitness.std(),
+        "fitness_max": fitness.max(),
+        "mean": weights.mean(axis=0),
+        "std": weights.std(axis=0),
+        "quantiles": np.quantile(weights, SUMMARY_QUANTILES, axis=0).T,
+        "hist": hist,
+        "fitness_corr": corr,
+    }
+
+
+def _summary_path(path:str, field:str) -> str:
+    return os.path.join(path, "summary_" + field + ".col")
+
+
+def _column_path(path:str, column:str) -> str:
+    return os.path.join(path, column + ".col")
+
+
+def _write_manifest(path:str, manifest:dict) -> None:
+    # Write to a temp file and swap it in, so a reader never sees half a manifest
+    tmp = os.path.join(path, MANIFEST_NAME + ".tmp")
+    with open(tmp, "w") as f:
+        json.dump(manifest, f, indent=1)
+    os.replace(tmp, os.path.join(path, MANIFEST_NAME))
+
+
+class HistoryStore:
+    """
+    Read side of a history store. All the column getters hand out read-only memory maps (or slices of them).
+    """
+
+    def __init__(self, path:str="history"):
+        self.path = path
+        with open(os.path.join(path, MANIFEST_NAME)) as f:
+            self.manifest = json.load(f)
+        if self.manifest["version"] != FORMAT_VERSION:
+            raise ValueError(f"Unsupported history format version {self.manifest['version']} in {path}")
+
+        self.columns = dict(self.manifest["columns"])
+        self.weight_names = tuple(self.manifest["weights"])
+        # generation -> (first row, number of rows)
+        self.partitions = {int(gen): tuple(rows) for gen, rows in self.manifest["generations"].items()}
+        self.n_rows = self.manifest["n_rows"]
+        self._maps = {}
+
+    @property
+    def generations(self) -> list:
+        return sorted(self.partitions)
+
+    def _map(self, column:str) -> np.ndarray:
+        if column not in self._maps:
+            if column not in self.columns:
+                raise KeyError(f"No column {column!r} in {self.path}")
+            dtype = np.dtype(self.columns[column])
+            if self.n_rows == 0:
+                self._maps[column] = np.empty(0, dtype=dtype)
+            else:
+                self._maps[column] = np.memmap(_column_path(self.path, column), dtype=dtype, mode="r", shape=(self.n_rows,))
+        return self._maps[column]
+
+    def _row_range(self, generations) -> tuple:
+        """
+        Generations are stored in order, so any generation range is one contiguous block of rows.
+        """
+        if generations is None:
+            return 0, self.n_rows
+        lo, hi = generations
+        selected = [self.partitions[gen] for gen in self.generations if lo <= gen <= hi]
+        if not selected:
+            return 0, 0
+        return selected[0][0], selected[-1][0] + selected[-1][1]
+
+    def column(self, column:str, generations:tuple=None) -> np.ndarray:
+        """
+        One column, optionally restricted to an inclusive (first, last) generation range. Zero copy.
+        """
+        start, stop = self._row_range(generations)
+        return self._map(column)[start:stop]
+
+    def load(self, columns:list=None, generations:tuple=None) -> dict:
+        """
+        Several columns at once as a dict of arrays (all of them if columns is None). Still zero copy.
+        """
+        if columns is None:
+            columns = list(self.columns)
+        start, stop = self._row_range(generations)
+        return {column: self._map(column)[start:stop] for column in columns}
+
+    def weight_matrix(self, generations:tuple=None) -> np.ndarray:
+        """
+        The weights as a (rows x weights) matrix, in WEIGHT_NAMES order. This one has to copy.
+        """
+        start, stop = self._row_range(generations)
+        return np.column_stack([self._map(name)[start:stop] for name in self.weight_names])
+
+    def bot_weights(self, generation:int=None, ident:int=None, bot_index:int=None) -> dict:
+        """
+        The weights dict of one bot, picked by ident or by bot_index within a generation (the last one by default).
+        With neither, you get the bot with the best fitness in that generation.
+        """
+        generation = self.generations[-1] if generation is None else generation
+        if generation not in self.partitions:
+            raise KeyError(f"No generation {generation} in {self.path}")
+        start, n_rows = self.partitions[generation]
+
+        if ident is not None:
+            matches = np.flatnonzero(self._map("ident")[start:start + n_rows] == ident)
+            if not len(matches):
+                raise KeyError(f"No bot with ident {ident} in generation {generation}")
+            row = start + int(matches[0])
+        elif bot_index is not None:
+            if not 0 <= bot_index < n_rows:
+                raise IndexError(f"Generation {generation} has bots 0 to {n_rows - 1}, not {bot_index}")
+            row = start + bot_index
+        else:
+            row = start + int(np.argmax(self._map("fitness")[start:start + n_rows]))
+
+        return {name: float(self._map(name)[row]) for name in self.weight_names}
+
+    def to_dataframe(self, columns:list=None, generations:tuple=None):
+        """
+        Same as load, but as a pandas DataFrame (pandas is only imported if you actually call this).
+        """
+        import pandas as pd
+        return pd.DataFrame(self.load(columns, generations))
+
+    def summary(self, generations:tuple=None) -> dict:
+        """
+        The per generation summaries as a dict of field -> array with one row per generation
+        (so "mean" is generations x weights, "hist" is generations x weights x bins, ...).
+        Also has the "weights", "quantile_levels" and "hist_edges" the rows refer to.
+        Stores written before summaries existed need build_summary() once (load_summary does that by itself).
+        """
+        if "summary" not in self.manifest:
+            raise KeyError(f"{self.path} has no summaries yet, run build_summary on it")
+
+        n_gens = len(self.manifest["summary"]["generations"])
+        summary = {}
+        for field, (dtype, shape) in _summary_layout(len(self.weight_names)).items():
+            if n_gens == 0:
+                summary[field] = np.empty((0, *shape), dtype=dtype)
+            else:
+                summary[field] = np.memmap(_summary_path(self.path, field), dtype=dtype, mode="r", shape=(n_gens, *shape))
+
+        if generations is not None:
+            lo, hi = generations
+            selected = (summary["generation"] >= lo) & (summary["generation"] <= hi)
+            summary = {field: values[selected] for field, values in summary.items()}
+
+        summary["weights"] = self.weight_names
+        summary["quantile_levels"] = tuple(self.manifest["summary"]["quantiles"])
+        summary["hist_edges"] = tuple(self.manifest["summary"]["hist_edges"])
+        return summary
+
+
+class HistoryWriter:
+    """
+    Write side of a history store. The GA hands it its whole population once per generation.
+
+    Generations are buffered and written flush_every at a time. With background=True the actual writing
+    (file appends, summaries, manifest) happens in a separate thread, so the GA never waits on the disk.
+    Either way, flush() blocks until everything handed over so far is on disk, and close() (which also runs
+    automatically at interpreter exit) flushes and stops the thread. Errors from the writer thread are raised
+    again on the next append / flush / close.
+    """
+
+    def __init__(self, path:str="history", weight_names:tuple=WEIGHT_NAMES, overwrite:bool=False,
+                 background:bool=False, flush_every:int=1):
+        self.path = path
+        os.makedirs(path, exist_ok=True)
+
+        manifest_path = os.path.join(path, MANIFEST_NAME)
+        if overwrite or not os.path.exists(manifest_path):
+            self.manifest = {
+                "version": FORMAT_VERSION,
+                "columns": {**BOT_COLUMNS, **{name: "<f8" for name in weight_names}},
+                "weights": list(weight_names),
+                "generations": {},
+                "n_rows": 0,
+            }
+            for column in self.manifest["columns"]:
+                open(_column_path(path, column), "wb").close()
+            self._reset_summary()
+            _write_manifest(path, self.manifest)
+        else:
+            with open(manifest_path) as f:
+                self.manifest = json.load(f)
+            if tuple(self.manifest["weights"]) != tuple(weight_names):
+                raise ValueError(f"{path} was written with different weights, use overwrite=True or another path")
+
+        self.weight_names = tuple(self.manifest["weights"])
+        self.flush_every = flush_every
+
+        self._pending = [] # Generations not handed to the writer yet
+        self._known_generations = set(self.manifest["generations"])
+        self._error = None
+        self._closed = False
+        self._queue = None
+        if background:
+            self._queue = queue.Queue()
+            self._thread = threading.Thread(target=self._drain_queue, name="history-writer", daemon=True)
+            self._thread.start()
+        atexit.register(self.close)
+
+    def _reset_summary(self) -> None:
+        self.manifest["summary"] = {
+            "generations": [],
+            "quantiles": list(SUMMARY_QUANTILES),
+            "hist_edges": list(SUMMARY_HIST_EDGES),
+        }
+        for field in _summary_layout(len(self.manifest["weights"])):
+            open(_summary_path(self.path, field), "wb").close()
+
+    def _append_summary(self, columns:dict) -> None:
+        summary_gens = self.manifest["summary"]["generations"]
+        summary = summarize(columns, self.weight_names)
+        for field, (dtype, _) in _summary_layout(len(self.weight_names)).items():
+            values = np.ascontiguousarray(summary[field], dtype=dtype)
+            with open(_summary_path(self.path, field), "r+b") as f:
+                f.truncate(len(summary_gens) * values.nbytes)
+                f.seek(0, os.SEEK_END)
+                f.write(values.tobytes())
+        summary_gens.append(int(summary["generation"]))
+
+    def append_columns(self, generation:int, columns:dict, summary_columns:dict=None) -> None:
+        """
+        Appends one generation, given as a dict of column name -> array (all the same length).
+        summary_columns is the population the generation's summary is computed from, if that's not the stored rows
+        (the GA stores the population after the cull, but summarizes the one it evaluated, see append_generation).
+        The values are copied right away, so the caller is free to change them afterwards.
+        """
+        self._raise_writer_error()
+        if self._closed:
+            raise ValueError(f"History writer for {self.path} is already closed")
+        if str(generation) in self._known_generations:
+            raise ValueError(f"Generation {generation} is already in {self.path}")
+
+        n_rows = len(columns["generation"])
+        snapshot = {}
+        for column, dtype in self.manifest["columns"].items():
+            snapshot[column] = np.array(columns[column], dtype=dtype)
+            if len(snapshot[column]) != n_rows:
+                raise ValueError(f"Column {column!r} has {len(snapshot[column])} rows, expected {n_rows}")
+
+        summary_snapshot = snapshot
+        if summary_columns is not None:
+            summary_snapshot = {column: np.array(summary_columns[column], dtype=self.manifest["columns"][column])
+                                for column in ("generation", "win", "loss", "draw", "fitness", *self.weight_names)}
+
+        self._known_generations.add(str(generation))
+        self._pending.append((generation, snapshot, summary_snapshot))
+        if len(self._pending) >= self.flush_every:
+            self._hand_off()
+
+    def _hand_off(self) -> None:
+        batch, self._pending = self._pending, []
+        if not batch:
+            return
+        if self._queue is None:
+            self._write_batch(batch)
+        else:
+            self._queue.put(batch)
+
+    def _drain_queue(self) -> None:
+        while True:
+            batch = self._queue.get()
+            try:
+                if batch is None:
+                    return
+                if self._error is None:
+                    self._write_batch(batch)
+            except BaseException as error:
+                self._error = error
+            finally:
+                self._queue.task_done()
+
+    def _raise_writer_error(self) -> None:
+        if self._error is not None:
+            error, self._error = self._error, None
+            raise RuntimeError(f"Writing history to {self.path} failed") from error
+
+    def _write_batch(self, batch:list) -> None:
+        """
+        Writes a list of (generation, columns, summary columns) in one go: a single append per column file and a single manifest update.
+        """
+        start = self.manifest["n_rows"]
+        for column in self.manifest["columns"]:
+            values = np.concatenate([columns[column] for _, columns, _ in batch])
+            with open(_column_path(self.path, column), "r+b") as f:
+                # Cut off anything a crashed run might have left behind the last complete generation
+                f.truncate(start * values.itemsize)
+                f.seek(0, os.SEEK_END)
+                f.write(values.tobytes())
+
+        for generation, columns, summary_columns in batch:
+            n_rows = len(columns["generation"])
+            self.manifest["generations"][str(generation)] = [self.manifest["n_rows"], n_rows]
+            self.manifest["n_rows"] += n_rows
+            if "summary" in self.manifest:
+                self._append_summary(summary_columns)
+        _write_manifest(self.path, self.manifest)
+
+    def flush(self) -> None:
+        """
+        Blocks until every generation appended so far is written to disk.
+        """
+        self._hand_off()
+        if self._queue is not None:
+            self._queue.join()
+        self._raise_writer_error()
+
+    def close(self) -> None:
+        if self._closed:
+            return
+        self._closed = True
+        atexit.unregister(self.close)
+        try:
+            self.flush()
+        finally:
+            if self._queue is not None:
+                self._queue.put(None)
+                self._thread.join()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+    def append_generation(self, generation:int, bots:list, evaluated:list=None) -> None:
+        """
+        Appends one generation straight from the GA's list of bot dicts. evaluated is the population as it was when
+        the fitness was computed (before the cull), the summary describes that one instead of bots.
+        """
+        summary_columns = None if evaluated is None else bot_columns(generation, evaluated, self.weight_names)
+        self.append_columns(generation, bot_columns(generation, bots, self.weight_names), summary_columns)
+
+
+def build_summary(path:str="history") -> HistoryStore:
+    """
+    (Re)computes the per generation summaries of an existing history store, for stores written before summaries existed.
+    Those only have the rows after the cull to go on, so the rebuilt summaries cover the survivors, not the culled bots.
+    Goes one generation at a time, so only one generation is ever in memory.
+    """
+    store = HistoryStore(path)
+    writer = HistoryWriter(path)
+    writer._reset_summary()
+    for gen in store.generations:
+        writer._append_summary(store.load(generations=(gen, gen)))
+    _write_manifest(path, writer.manifest)
+    writer.close()
+    return HistoryStore(path)
+
+
+def bot_columns(generation:int, bots:list, weight_names:tuple=WEIGHT_NAMES) -> dict:
+    """
+    Turns the GA's bot dicts into columns, bot_index being the position in the list.
+    """
+    columns = {
+        "generation": np.full(len(bots), generation),
+        "bot_index": np.arange(len(bots)),
+        "ident": [bot["ident"] for bot in bots],
+        "win": [bot["score"]["win"] for bot in bots],
+        "loss": [bot["score"]["loss"] for bot in bots],
+        "draw": [bot["score"]["draw"] for bot in bots],
+        "fitness": [bot["fitness"] for bot in bots],
+        "ranking": [bot["ranking"] for bot in bots],
+    }
+    for name in weight_names:
+        columns[name] = [bot["weights"][name] for bot in bots]
+    return columns
+
+
+# The old history.csv columns we know how to read, and what they are called in a history store
+CSV_COLUMNS = {
+    "Generation": "generation",
+    "Bot Index": "bot_index",
+    "Bot Identifier": "ident",
+    "Score": None, # Stringified {'win': .., 'loss': .., 'draw': ..} dict
+    "Fitness": "fitness",
+    "Overall Ranking": "ranking",
+    "Weights": None, # Stringified dict of all the weights
+}
+
+
+def iter_csv_chunks(csv_path:str, chunksize:int=20_000, generations:tuple=None, weights:list=None):
+    """
+    Streams an old semicolon separated history.csv (a history.zip with one inside works too, pandas reads it directly)
+    and yields dicts of column name -> array, named like the history store columns, one chunk at a time.
+
+    generations is an inclusive (first, last) range, and weights a list of the weights you actually want (default all of them).
+    The weight dicts are parsed with one vectorized regex per wanted weight (no literal_eval per row),
+    so asking for fewer weights is proportionally faster, and memory only ever holds a single chunk.
+    """
+    import pandas as pd
+
+    weights = list(WEIGHT_NAMES) if weights is None else list(weights)
+    usecols = ["Generation", "Bot Index", "Bot Identifier", "Score", "Fitness", "Overall Ranking"]
+    if weights:
+        usecols.append("Weights")
+
+    for chunk in pd.read_csv(csv_path, sep=";", usecols=usecols, chunksize=chunksize):
+        if generations is not None:
+            lo, hi = generations
+            # The GA writes generations in order, so once we are past the range we can stop reading
+            if chunk["Generation"].iloc[0] > hi:
+                break
+            chunk = chunk[(chunk["Generation"] >= lo) & (chunk["Generation"] <= hi)]
+            if chunk.empty:
+                continue
+
+        columns = {new: chunk[old].to_numpy() for old, new in CSV_COLUMNS.items() if new is not None}
+
+        # Always written as {'win': W, 'loss': L, 'draw': D}, so the three numbers come in that order
+        scores = chunk["Score"].str.extract(r"(-?\d+)\D+(-?\d+)\D+(-?\d+)").astype(int)
+        columns["win"], columns["loss"], columns["draw"] = (scores[i].to_numpy() for i in range(3))
+
+        # Children get their weights in a random key order (see how_is_baby_made), so we look each key up by name
+        for name in weights:
+            columns[name] = chunk["Weights"].str.extract(rf"'{name}': ([^,}}]+)", expand=False).astype(float).to_numpy()
+
+        yield columns
+
+
+def import_csv(csv_path:str, path:str="history", chunksize:int=20_000) -> HistoryStore:
+    """
+    Converts an old semicolon separated history.csv (or history.zip with one inside) into a history store.
+    Streams the CSV in chunks, so this works for runs that don't fit in memory.
+    """
+    # Writing happens in the background while we parse the next chunk
+    with HistoryWriter(path, overwrite=True, background=True) as writer:
+        for gen, columns in _iter_generations(iter_csv_chunks(csv_path, chunksize=chunksize)):
+            writer.append_columns(gen, columns)
+
+    return HistoryStore(path)
+
+
+def _iter_generations(chunks):
+    """
+    Regroups a stream of column chunks (like iter_csv_chunks yields them) into (generation, columns) pairs,
+    one whole generation at a time.
+    """
+    pending = None
+    for columns in chunks:
+        if pending is not None:
+            columns = {name: np.concatenate([pending[name], values]) for name, values in columns.items()}
+
+        # A chunk can end in the middle of a generation, so the last generation waits for the next chunk
+        gens = columns["generation"]
+        last_start = np.searchsorted(gens, gens[-1])
+        for gen, first in zip(*np.unique(gens[:last_start], return_index=True)):
+            stop = np.searchsorted(gens, gen, side="right")
+            yield int(gen), {name: values[first:stop] for name, values in columns.items()}
+        pending = {name: values[last_start:] for name, values in columns.items()}
+
+    if pending is not None and len(pending["generation"]):
+        yield int(pending["generation"][0]), pending
+
+
+def load_dataframe(source:str="history", generations:tuple=None, weights:list=None):
+    """
+    Loads a run as a pandas DataFrame, from either a history store directory or an old history.csv / history.zip.
+    Only the requested generation range and weights end up in memory.
+    """
+    import pandas as pd
+
+    if os.path.isdir(source):
+        store = HistoryStore(source)
+        weights = store.weight_names if weights is None else weights
+        return store.to_dataframe([*BOT_COLUMNS, *weights], generations)
+
+    weights = WEIGHT_NAMES if weights is None else weights
+    chunks = [pd.DataFrame(columns) for columns in iter_csv_chunks(source, generations=generations, weights=weights)]
+    if not chunks:
+        # Nothing in the generation range, same empty frame the store branch gives
+        return pd.DataFrame({column: np.empty(0, dtype=BOT_COLUMNS[column]) for column in BOT_COLUMNS}
+                            | {name: np.empty(0, dtype="<f8") for name in weights})
+    return pd.concat(chunks, ignore_index=True)[[*BOT_COLUMNS, *weights]]
+
+
+def load_summary(source:str="history", generations:tuple=None) -> dict:
+    """
+    The per generation summaries (see HistoryStore.summary) of either a history store directory or an old
+    history.csv / history.zip. Stores written before summaries existed get them built on the spot, CSVs are summarized
+    one generation at a time while streaming.
+    """
+    if os.path.isdir(source):
+        store = HistoryStore(source)
+        if "summary" not in store.manifest:
+            store = build_summary(source)
+        return store.summary(generations)
+
+    rows = [summarize(columns) for _, columns in _iter_generations(iter_csv_chunks(source, generations=generations))]
+    summary = {}
+    for field, (dtype, shape) in _summary_layout(len(WEIGHT_NAMES)).items():
+        summary[field] = np.array([row[field] for row in rows], dtype=dtype).reshape(len(rows), *shape)
+    summary["weights"] = WEIGHT_NAMES
+    summary["quantile_levels"] = SUMMARY_QUANTILES
+    summary["hist_edges"] = SUMMARY_HIST_EDGES
+    return summary
+
+
+if __name__ == "__main__":
+    import argparse
+
+    parser = argparse.ArgumentParser(description="Convert an old history.csv / history.zip into a columnar history store.")
+    parser.add_argument("csv_path", help="history.csv or history.zip")
+    parser.add_argument("path", nargs="?", default="history", help="Where to put the history store")
+    args = parser.parse_args()
+
+    store = import_csv(args.csv_path, args.path)
+    print(f"Imported {store.n_rows} rows over {len(store.generations)} generations into {args.path}")
@@ -0,0 +1,187 @@
+"""
+On-disk table of feature vectors for opening positions, so runs stop re-evaluating the same first few plies over and over.
+
+The book is a directory with two arrays, memory mapped on first use:
+
+    opening_book/
+        keys.npy      uint64[n]              position_key of every position, sorted
+        features.npy  float32[n, n_features] extract_features of that position, same order
+
+Lookups are a binary search on keys. Positions are stored from both players' point of view, since leaves get scored
+for whoever is searching. The book is filled with every position up to some number of plies from the start (build)
+and grows with positions from past games (harvest), both only ever adding positions it doesn't have yet.
+At runtime it is read-only: register it with search_and_score.register_feature_cache and it answers before anything else.
+"""
+
+import os
+
+import chess
+import numpy as np
+
+from search_and_score import WEIGHT_NAMES, extract_features, position_key
+
+
+class OpeningBook:
+
+    def __init__(self, path:str="opening_book"):
+        self.path = path
+        self.keys = None
+        self.features = None
+        self.hits = 0
+        self.misses = 0
+
+    def _load(self) -> None:
+        self.keys = np.load(os.path.join(self.path, "keys.npy"), mmap_mode="r")
+        self.features = np.load(os.path.join(self.path, "features.npy"), mmap_mode="r")
+        if len(self.keys) != len(self.features):
+            raise ValueError(f"{self.path} is inconsistent, {len(self.keys)} keys but {len(self.features)} feature rows")
+
+    def __len__(self):
+        if self.keys is None:
+            self._load()
+        return len(self.keys)
+
+    def get(self, key:int):
+        """
+        The stored features for a position_key, or None.
+        """
+        if self.keys is None:
+            self._load()
+        index = int(np.searchsorted(self.keys, np.uint64(key)))
+        if index < len(self.keys) and int(self.keys[index]) == key:
+            self.hits += 1
+            return self.features[index].tolist()
+        self.misses += 1
+        return None
+
+    def put(self, key:int, features:list) -> None:
+        pass # Read-only while playing, it only grows through build / harvest
+
+    def stats(self) -> dict:
+        return {"hits": self.hits, "misses": self.misses}
+
+    def take_stats(self) -> dict:
+        """
+        stats(), and start counting from zero again (worker processes send these back to the main process).
+        """
+        stats = self.stats()
+        self.hits = self.misses = 0
+        return stats
+
+    def merge_stats(self, stats:dict) -> None:
+        self.hits += stats["hits"]
+        self.misses += stats["misses"]
+
+
+def positions_up_to(n_plies:int, board:chess.Board=None):
+    """
+    Yields every position reachable in at most n_plies from board (the start position by default), each one only once.
+    """
+    board = board or chess.Board()
+    seen = {} # key -> shallowest depth we got there at, a transposition found earlier still needs expanding from there
+
+    def walk(depth):
+        key = position_key(board, True)
+        if key in seen and seen[key] <= depth:
+            return
+        if key not in seen:
+            yield board.copy(stack=False)
+        seen[key] = depth
+        if depth == n_plies:
+            return
+        for move in list(board.legal_moves):
+            board.push(move)
+            yield from walk(depth + 1)
+            board.pop()
+
+    yield from walk(0)
+
+
+def add_positions(path:str, boards) -> int:
+    """
+    Adds positions to the book at path (creating it if needed), computing features only for the ones it doesn't have.
+    Returns how many new entries (positions x points of view) were added.
+    """
+    keys_path = os.path.join(path, "keys.npy")
+    features_path = os.path.join(path, "features.npy")
+    if os.path.exists(keys_path):
+        old_keys = np.load(keys_path)
+        old_features = np.load(features_path)
+    else:
+        old_keys = np.empty(0, dtype=np.uint64)
+        old_features = np.empty((0, len(WEIGHT_NAMES)), dtype=np.float32)
+    known = set(old_keys.tolist())
+
+    new_keys = []
+    new_features = []
+    for board in boards:
+        for is_white in (True, False):
+            key = position_key(board, is_white)
+            if key in known:
+                continue
+            known.add(key)
+            new_keys.append(key)
+            new_features.append(extract_features(board, is_white))
+
+    if not new_keys:
+        return 0
+
+    keys = np.concatenate([old_keys, np.array(new_keys, dtype=np.uint64)])
+    features = np.concatenate([old_features, np.array(new_features, dtype=np.float32)])
+    order = np.argsort(keys, kind="stable")
+
+    os.makedirs(path, exist_ok=True)
+    # Features first and keys last, swapped in as whole files, so a reader mapping the book never sees half a write
+    for final_path, array in ((features_path, features[order]), (keys_path, keys[order])):
+        with open(final_path + ".tmp", "wb") as f:
+            np.save(f, array)
+        os.replace(final_path + ".tmp", final_path)
+
+    return len(new_keys)
+
+
+def build(path:str="opening_book", n_plies:int=3) -> int:
+    """
+    Puts every position up to n_plies from the start into the book.
+    """
+    return add_positions(path, positions_up_to(n_plies))
+
+
+def harvest(path:str, replay_paths:list, max_plies:int=12) -> int:
+    """
+    Adds the first max_plies positions of every stored game (see replay.py), plus every position one move away from them,
+    since those are the leaves a depth 1 search from there looks at.
+    """
+    from replay import iter_games
+
+    def game_positions():
+        for replay_path in replay_paths:
+            for game in iter_games(replay_path):
+                board = chess.Board()
+                for move in game.moves()[:max_plies]:
+                    yield from positions_up_to(1, board)
+                    board.push(move)
+                yield from positions_up_to(1, board)
+
+    return add_positions(path, game_positions())
+
+
+if __name__ == "__main__":
+    import argparse
+    import glob
+
+    parser = argparse.ArgumentParser(description="Build or grow the opening position feature book.")
+    parser.add_argument("--path", default="opening_book", help="Book directory")
+    commands = parser.add_subparsers(dest="command", required=True)
+    build_parser = commands.add_parser("build", help="Add every position up to N plies from the start")
+    build_parser.add_argument("--plies", type=int, default=3)
+    harvest_parser = commands.add_parser("harvest", help="Add positions from replay files")
+    harvest_parser.add_argument("replays", nargs="+", help="Replay files or glob patterns, e.g. 'replays/*.gcr'")
+    harvest_parser.add_argument("--plies", type=int, default=12, help="How far into each game to harvest")
+    args = parser.parse_args()
+
+    if args.command == "build":
+        added = build(args.path, args.plies)
+    else:
+        added = harvest(args.path, [p for pattern in args.replays for p in sorted(glob.glob(pattern))], args.plies)
+    print(f"Added {added} entries, {args.path} now has {len(OpeningBook(args.path))}")
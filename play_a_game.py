@@ -7,40 +7,52 @@ We will also need to keep track of who wins, for later use in the GA
 
 import chess
 import random
-from search_and_score import build_search_tree, score_tree
+import search_and_score # Used as search_and_score.<function>, so profiling.py can swap in instrumented versions
+import profiling
 
 
-def play_game(weights_1:dict, weights_2:dict, search_depth:int=1, replayable:bool=False) -> tuple:
+def rank_moves(board:chess.Board, weights:dict, search_depth:int=1, stats:dict=None) -> tuple:
+    """
+    Searches from board for whoever's turn it is, and returns ({move as UCI string: score}, best score).
+    If a stats dict is given, the search tree "nodes" generated get added to it.
+    """
+    tree = search_and_score.build_search_tree(board, depth=search_depth)
+    if stats is not None:
+        stats["nodes"] = stats.get("nodes", 0) + search_and_score.count_nodes(tree)
+    scored_moves = search_and_score.score_tree(tree, is_player_white=(board.turn == chess.WHITE), weights=weights)
+
+    move_scores = {}
+    max_score = 0
+    for move, subtree in scored_moves.items():
+        if type(subtree) is dict:
+            move_scores[move] = subtree["score"]
+        else:
+            max_score = subtree
+    return move_scores, max_score
+
+
+def play_game(weights_1:dict, weights_2:dict, search_depth:int=1, replayable:bool=False, seed:int=None, stats:dict=None) -> tuple:
     """
     Plays a game, using the weights for the scoring of each bot's descisions
     Returns bool-like value for winner, if bot_1 wins we return 0, bot_2 wins we return 1, and on a tie we return 2
 
     We simply pick the highest score, and random between them during ties
+    If a seed is given, the tie breaks use their own RNG seeded with it, so the game can be repeated exactly
+    If a stats dict is given, the number of "plies" played and search tree "nodes" generated get added to it
     """
+    rand = random.Random(seed) if seed is not None else random
     board = chess.Board()
     moves_made = [] # For replay later
 
     while not board.is_game_over():
-        if board.turn == chess.WHITE:
-            weights = weights_1
-            is_white = True
-        else:
-            weights = weights_2
-            is_white = False
-
-        tree = build_search_tree(board, depth=search_depth)
-        scored_moves = score_tree(tree, is_player_white=is_white, weights=weights)
-
-        move_scores = {}
-        max_score = 0
-        for move, subtree in scored_moves.items():
-            if type(subtree) is dict:
-                move_scores[move] = subtree["score"]
-            else:
-                max_score = subtree
+        weights = weights_1 if board.turn == chess.WHITE else weights_2
+
+        if stats is not None:
+            stats["plies"] = stats.get("plies", 0) + 1
+        move_scores, max_score = rank_moves(board, weights, search_depth=search_depth, stats=stats)
         best_moves = [move for move, score in move_scores.items() if score == max_score]
 
-        chosen_move = random.choice(best_moves)
+        chosen_move = rand.choice(best_moves)
         moves_made.append(chosen_move)
 
         #print(chosen_move)
@@ -57,25 +69,62 @@ def play_game(weights_1:dict, weights_2:dict, search_depth:int=1, replayable:boo
         return (2, moves_made) if replayable else (2,) # Tie case
 
     
+_worker_profiling = False
+_worker_book = None
+
+
+def init_worker(feature_cache_handle:tuple=None, profile:bool=False, opening_book_path:str=None) -> None:
+    """
+    Pool initializer for processes running play_game_task.
+    Opens the opening book (see opening_book.py), attaches to the shared feature cache (see feature_cache.py),
+    and turns on profiling if asked to.
+    """
+    global _worker_profiling, _worker_book
+    caches = []
+    if opening_book_path is not None:
+        from opening_book import OpeningBook
+        _worker_book = OpeningBook(opening_book_path)
+        caches.append(_worker_book)
+    if feature_cache_handle is not None:
+        from feature_cache import SharedFeatureCache
+        caches.append(SharedFeatureCache.attach(feature_cache_handle))
+    search_and_score.FEATURE_CACHES[:] = caches
+    if profile:
+        profiling.enable()
+        _worker_profiling = True
+
+
+def play_game_task(task:tuple) -> tuple:
+    """
+    play_game for process pools. task is (weights_1, weights_2, search_depth, seed).
+    Returns (result, moves, stats, profile), profile being this game's profiling snapshot in workers with profiling on, None otherwise.
+    In workers with an opening book, stats also gets the book's "opening_book" hit counts for this game.
+    """
+    weights_1, weights_2, search_depth, seed = task
+    stats = {}
+    result, moves = play_game(weights_1, weights_2, search_depth=search_depth, replayable=True, seed=seed, stats=stats)
+    if _worker_book is not None:
+        stats["opening_book"] = _worker_book.take_stats()
+    profile = profiling.snapshot(reset_after=True) if _worker_profiling else None
+    return result, moves, stats, profile
+
+
 def view_replay(moves:list):
     """
-    Given a list of moves, replay the game in the console, and into a txt file (result.txt)
+    Given a list of moves, replay the game in the console.
+    To keep a game around, store it with replay.py instead (way smaller than dumping every board)
     """
     board = chess.Board()
-    with open("result.txt", "w") as f:
-        f.write("Initial Board:\n")
-        f.write(str(board) + "\n\n")
-        print("Initial Board:")
+    print("Initial Board:")
+    print(board)
+    print()
+
+    for move in moves:
+        board_move = chess.Move.from_uci(move)
+        board.push(board_move)
         print(board)
         print()
 
-        for move in moves:
-            board_move = chess.Move.from_uci(move)
-            board.push(board_move)
-            f.write(str(board) + "\n\n")
-            print(board)
-            print()
-
 
 if __name__ == "__main__":
     import time
@@ -146,8 +195,13 @@ if __name__ == "__main__":
 
     start = time.perf_counter()
 
-    result = play_game(weights_bot1, weights_bot2, search_depth=1, replayable=True)
+    result = play_game(weights_bot1, weights_bot2, search_depth=1, replayable=True, seed=47)
     print("Winner:", result[0])
     view_replay(result[1])
     print("Time taken:", time.perf_counter() - start)
 
+    # Keep the game around, view it again with: python replay.py result.gcr -1
+    from replay import ReplayWriter
+    with ReplayWriter("result.gcr") as writer:
+        writer.append(result[1], white_ident=1, black_ident=2, seed=47, result=result[0])
+
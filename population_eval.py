@@ -0,0 +1,94 @@
+"""
+Scores positions for a whole population at once. A bot's score is just its weights dotted with the position's features
+(see score_move), so instead of scoring every position once per bot, we extract the features once and do one matrix
+multiply:
+
+    scores[n_positions, n_bots] = features[n_positions, n_features] @ weights[n_bots, n_features].T
+
+    positions = [chess.Board(), ...]
+    scores = score_positions(positions, [bot["weights"] for bot in bots])
+
+Also works for searches: rank_moves_population builds the search tree once, scores its leaves for every bot in one go,
+and propagates the best leaf up the tree per bot, the way score_tree does it.
+Results match score_move up to floating point rounding (the sum happens in a different order).
+"""
+
+import chess
+import numpy as np
+
+import search_and_score
+from replay import decode_move
+from search_tree import build_tree
+
+
+def weight_matrix(population) -> np.ndarray:
+    """
+    float64[n_bots, n_features] from a list of weight dicts (or bot dicts with a "weights" entry), columns in
+    WEIGHT_NAMES order. Arrays are passed through (HistoryStore.weight_matrix already gives us one).
+    """
+    if isinstance(population, np.ndarray):
+        if population.ndim != 2 or population.shape[1] != len(search_and_score.WEIGHT_NAMES):
+            raise ValueError(f"Expected a (n_bots, {len(search_and_score.WEIGHT_NAMES)}) weight matrix, got {population.shape}")
+        return population.astype(np.float64, copy=False)
+    rows = []
+    for weights in population:
+        weights = weights.get("weights", weights)
+        rows.append([weights[name] for name in search_and_score.WEIGHT_NAMES])
+    return np.array(rows, dtype=np.float64).reshape(-1, len(search_and_score.WEIGHT_NAMES))
+
+
+def feature_matrix(positions, is_player_white=None) -> np.ndarray:
+    """
+    float64[n_positions, n_features] of boards or FENs, through the registered feature caches.
+    is_player_white is whose point of view to take: one bool for all positions, one per position,
+    or None for the side to move in each.
+    """
+    rows = []
+    for i, position in enumerate(positions):
+        board = chess.Board(position) if isinstance(position, str) else position
+        if is_player_white is None:
+            is_white = board.turn == chess.WHITE
+        elif isinstance(is_player_white, bool):
+            is_white = is_player_white
+        else:
+            is_white = bool(is_player_white[i])
+        rows.append(search_and_score.position_features(board, is_white))
+    return np.array(rows, dtype=np.float64).reshape(-1, len(search_and_score.WEIGHT_NAMES))
+
+
+def score_features(features:np.ndarray, population) -> np.ndarray:
+    """
+    float64[n_positions, n_bots] for feature rows we already have, e.g. an opening book's features array.
+    """
+    return np.asarray(features, dtype=np.float64) @ weight_matrix(population).T
+
+
+def score_positions(positions, population, is_player_white=None) -> np.ndarray:
+    """
+    float64[n_positions, n_bots], every bot's score_move of every position.
+    """
+    return score_features(feature_matrix(positions, is_player_white), population)
+
+
+def rank_moves_population(board:chess.Board, population, search_depth:int=1) -> tuple:
+    """
+    rank_moves for every bot at once. Returns (moves as UCI strings, float64[n_moves, n_bots] scores),
+    from the point of view of the side to move. Each bot's best move is moves[scores[:, bot].argmax()].
+    """
+    weights = weight_matrix(population)
+    tree = build_tree(board, search_depth, with_features=True)
+
+    node_scores = np.full((len(tree), len(weights)), -np.inf)
+    leaves = np.flatnonzero(tree.feature_row >= 0)
+    node_scores[leaves] = score_features(tree.features[tree.feature_row[leaves]], weights)
+
+    # Bottom up, one level at a time: every node is worth its best child, or 0 without children (like score_tree)
+    for depth in range(search_depth - 1, -1, -1):
+        children = np.flatnonzero(tree.depth == depth + 1)
+        np.maximum.at(node_scores, tree.parent[children], node_scores[children])
+        level = tree.depth == depth
+        node_scores[level & np.isneginf(node_scores).all(axis=1)] = 0
+
+    root_children = tree.children(0)
+    moves = [decode_move(int(code)).uci() for code in tree.move[root_children]]
+    return moves, node_scores[root_children]
@@ -0,0 +1,139 @@
+"""
+Opt-in instrumentation for the search, so we know where the time actually goes.
+
+When enabled this records:
+- cumulative time and call count of every rule in score_move (see search_and_score.RULES)
+- how many leaves got evaluated and how long score_move took in total
+- how many search tree nodes got generated
+- how many games were played and how many moves they took (the GA reports those with record_game)
+
+It works by swapping instrumented versions of the functions into search_and_score, and swapping the originals back
+on disable(). So with profiling off the search runs exactly the same code as without this module, no flags checked anywhere.
+The numbers are per process, worker processes send theirs back to be merge()d (see play_a_game.play_game_task).
+"""
+
+import json
+import time
+
+import search_and_score
+
+
+_originals = {}
+
+rule_time = {name: 0.0 for name in search_and_score.WEIGHT_NAMES}
+rule_calls = {name: 0 for name in search_and_score.WEIGHT_NAMES}
+counters = {"games": 0, "moves": 0, "nodes": 0, "leaves": 0, "score_time": 0.0}
+
+
+def _timed_rule(name:str, rule):
+    def timed(board, friendly_color, enemy_color, is_player_white):
+        start = time.perf_counter()
+        value = rule(board, friendly_color, enemy_color, is_player_white)
+        rule_time[name] += time.perf_counter() - start
+        rule_calls[name] += 1
+        return value
+    return timed
+
+
+def _counted_score_move(board, is_player_white, weights):
+    start = time.perf_counter()
+    score = _originals["score_move"](board, is_player_white, weights)
+    counters["score_time"] += time.perf_counter() - start
+    counters["leaves"] += 1
+    return score
+
+
+def _counted_build_search_tree(board, depth=1):
+    counters["nodes"] += 1
+    return _originals["build_search_tree"](board, depth)
+
+
+def is_enabled() -> bool:
+    return bool(_originals)
+
+
+def enable() -> None:
+    """
+    Swaps the instrumented functions into search_and_score. Does nothing if already enabled.
+    """
+    if is_enabled():
+        return
+    _originals["RULES"] = search_and_score.RULES
+    _originals["score_move"] = search_and_score.score_move
+    _originals["build_search_tree"] = search_and_score.build_search_tree
+
+    search_and_score.RULES = tuple(
+        _timed_rule(name, rule) for name, rule in zip(search_and_score.WEIGHT_NAMES, _originals["RULES"]))
+    search_and_score.score_move = _counted_score_move
+    search_and_score.build_search_tree = _counted_build_search_tree
+
+
+def disable() -> None:
+    """
+    Puts the original functions back. The numbers collected so far are kept.
+    """
+    for name, original in _originals.items():
+        setattr(search_and_score, name, original)
+    _originals.clear()
+
+
+def record_game(n_moves:int) -> None:
+    counters["games"] += 1
+    counters["moves"] += n_moves
+
+
+def reset() -> None:
+    for name in rule_time:
+        rule_time[name] = 0.0
+        rule_calls[name] = 0
+    for name in counters:
+        counters[name] = 0.0 if isinstance(counters[name], float) else 0
+
+
+def merge(snap:dict) -> None:
+    """
+    Adds a snapshot taken somewhere else (say in a worker process) to the numbers of this process.
+    """
+    for name, rule in snap["rules"].items():
+        rule_time[name] += rule["time"]
+        rule_calls[name] += rule["calls"]
+    for name, value in snap["counters"].items():
+        counters[name] += value
+
+
+def snapshot(reset_after:bool=False) -> dict:
+    """
+    A copy of everything recorded so far, optionally starting from zero again afterwards.
+    """
+    snap = {
+        "counters": dict(counters),
+        "rules": {name: {"time": rule_time[name], "calls": rule_calls[name]} for name in rule_time},
+    }
+    if reset_after:
+        reset()
+    return snap
+
+
+def format_report(snap:dict, top:int=10) -> str:
+    """
+    Human readable summary of a snapshot: the counters, and the slowest rules with their share of the rule time.
+    """
+    c = snap["counters"]
+    lines = [
+        f"{c['games']} games, {c['moves']} moves ({c['moves'] / max(c['games'], 1):.1f} per game), "
+        f"{c['nodes']} nodes, {c['leaves']} leaves, {c['score_time']:.2f}s scoring"
+    ]
+    total = sum(rule["time"] for rule in snap["rules"].values()) or 1.0
+    slowest = sorted(snap["rules"].items(), key=lambda item: item[1]["time"], reverse=True)[:top]
+    for name, rule in slowest:
+        per_call = rule["time"] / max(rule["calls"], 1) * 1e6
+        lines.append(f"  {name:<34} {rule['time']:8.3f}s {100 * rule['time'] / total:5.1f}%  {per_call:7.1f}us/call")
+    return "\n".join(lines)
+
+
+def dump(path:str, generation:int, snap:dict) -> None:
+    """
+    Appends a snapshot as one JSON line, tagged with the generation it belongs to.
+    """
+    with open(path, "a") as f:
+        f.write(json.dumps({"generation": generation, **snap}) + "\n")
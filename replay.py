@@ -0,0 +1,243 @@
+"""
+Compact binary replays, so we can keep every single tournament game without drowning in board dumps.
+
+A replay file is append-only and holds many games (we use one file per generation).
+Each game is a small fixed header followed by its moves, packed as 16-bit move codes:
+
+    bits 0-5   from square
+    bits 6-11  to square
+    bits 12-14 promotion piece type (0 if none)
+
+Next to every replay file there is a tiny index file (same name + ".idx") with the byte offset of each game,
+which gives us random access to any game by its index. If the index goes missing it is simply rebuilt by scanning.
+"""
+
+import os
+import struct
+from array import array
+
+import chess
+
+
+FILE_MAGIC = b"GCBR\x01\x00\x00\x00" # Name + format version, padded to 8 bytes
+GAME_HEADER = struct.Struct("<IIQBH") # white ident, black ident, seed, result, number of plies
+INDEX_ENTRY = struct.Struct("<Q")
+
+RESULT_TO_PGN = {0: "1-0", 1: "0-1", 2: "1/2-1/2"}
+
+
+def encode_move(move:chess.Move) -> int:
+    """
+    Packs a move into 16 bits (see module docstring for the layout).
+    """
+    return move.from_square | (move.to_square << 6) | ((move.promotion or 0) << 12)
+
+
+def decode_move(code:int) -> chess.Move:
+    """
+    Inverse of encode_move.
+    """
+    promotion = (code >> 12) & 0x7
+    return chess.Move(code & 0x3F, (code >> 6) & 0x3F, promotion=promotion or None)
+
+
+def encode_moves(moves:list) -> array:
+    """
+    Packs a list of moves (UCI strings, like play_game returns them, or chess.Move objects) into an array of 16-bit codes.
+    """
+    codes = array("H")
+    for move in moves:
+        if isinstance(move, str):
+            move = chess.Move.from_uci(move)
+        codes.append(encode_move(move))
+    return codes
+
+
+class ReplayGame:
+    """
+    One game read back from a replay file.
+    """
+    __slots__ = ("white_ident", "black_ident", "seed", "result", "codes")
+
+    def __init__(self, white_ident:int, black_ident:int, seed:int, result:int, codes:array):
+        self.white_ident = white_ident
+        self.black_ident = black_ident
+        self.seed = seed
+        self.result = result # Same convention as play_game: 0 white won, 1 black won, 2 draw
+        self.codes = codes
+
+    def __len__(self):
+        return len(self.codes)
+
+    def moves(self) -> list:
+        """
+        The moves as chess.Move objects.
+        """
+        return [decode_move(code) for code in self.codes]
+
+    def uci_moves(self) -> list:
+        """
+        The moves as UCI strings, which is what view_replay and friends want.
+        """
+        return [decode_move(code).uci() for code in self.codes]
+
+    def to_pgn(self, event:str="GeneticChessBots") -> str:
+        """
+        Exports the game as a PGN string.
+        """
+        import chess.pgn # Only needed here, no reason to make everyone import it
+
+        game = chess.pgn.Game()
+        game.headers["Event"] = event
+        game.headers["White"] = str(self.white_ident)
+        game.headers["Black"] = str(self.black_ident)
+        game.headers["Result"] = RESULT_TO_PGN[self.result]
+        game.headers["Seed"] = str(self.seed)
+
+        node = game
+        for move in self.moves():
+            node = node.add_variation(move)
+
+        return str(game)
+
+
+class ReplayWriter:
+    """
+    Appends games to a replay file (and its index). Keeps both files open, so writing a game is just two small writes.
+    Use it as a context manager, or call close() when done.
+    """
+
+    def __init__(self, path:str, overwrite:bool=False):
+        """
+        Appends to an existing file by default, overwrite=True starts it (and its index) from scratch.
+        """
+        directory = os.path.dirname(path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+
+        self.path = path
+        mode = "wb" if overwrite else "ab"
+        self._file = open(path, mode)
+        if self._file.tell() == 0:
+            self._file.write(FILE_MAGIC)
+        self._index = open(path + ".idx", mode)
+
+    def append(self, moves:list, white_ident:int, black_ident:int, seed:int, result:int) -> None:
+        """
+        Writes one game. moves can be UCI strings or chess.Move objects.
+        """
+        codes = encode_moves(moves)
+        self._index.write(INDEX_ENTRY.pack(self._file.tell()))
+        self._file.write(GAME_HEADER.pack(white_ident, black_ident, seed, result, len(codes)))
+        self._file.write(codes.tobytes())
+
+    def flush(self) -> None:
+        self._file.flush()
+        self._index.flush()
+
+    def close(self) -> None:
+        self._file.close()
+        self._index.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+
+def _read_game_at(f, offset:int) -> ReplayGame:
+    f.seek(offset)
+    white_ident, black_ident, seed, result, n_plies = GAME_HEADER.unpack(f.read(GAME_HEADER.size))
+    codes = array("H")
+    codes.frombytes(f.read(2 * n_plies))
+    return ReplayGame(white_ident, black_ident, seed, result, codes)
+
+
+def _check_magic(f, path:str) -> None:
+    if f.read(len(FILE_MAGIC)) != FILE_MAGIC:
+        raise ValueError(f"{path} is not a replay file")
+
+
+def rebuild_index(path:str) -> int:
+    """
+    Scans the replay file and rewrites its index. Returns the number of games found.
+    """
+    offsets = []
+    size = os.path.getsize(path)
+    with open(path, "rb") as f:
+        _check_magic(f, path)
+        offset = f.tell()
+        while offset + GAME_HEADER.size <= size:
+            n_plies = GAME_HEADER.unpack(f.read(GAME_HEADER.size))[-1]
+            end = offset + GAME_HEADER.size + 2 * n_plies
+            if end > size:
+                break # Half written game at the end, ignore it
+            offsets.append(offset)
+            offset = end
+            f.seek(offset)
+
+    with open(path + ".idx", "wb") as f:
+        for offset in offsets:
+            f.write(INDEX_ENTRY.pack(offset))
+
+    return len(offsets)
+
+
+def _load_index(path:str) -> array:
+    if not os.path.exists(path + ".idx"):
+        rebuild_index(path)
+    offsets = array("Q")
+    with open(path + ".idx", "rb") as f:
+        data = f.read()
+    offsets.frombytes(data[:len(data) - len(data) % INDEX_ENTRY.size])
+    return offsets
+
+
+def count_games(path:str) -> int:
+    """
+    Number of games in a replay file.
+    """
+    return os.path.getsize(path + ".idx") // INDEX_ENTRY.size if os.path.exists(path + ".idx") else rebuild_index(path)
+
+
+def read_game(path:str, index:int) -> ReplayGame:
+    """
+    Random access to a single game in a replay file. Negative indexes count from the end, like lists.
+    """
+    offsets = _load_index(path)
+    with open(path, "rb") as f:
+        _check_magic(f, path)
+        return _read_game_at(f, offsets[index])
+
+
+def iter_games(path:str):
+    """
+    Yields every game in a replay file, in the order they were written.
+    """
+    offsets = _load_index(path)
+    with open(path, "rb") as f:
+        _check_magic(f, path)
+        for offset in offsets:
+            yield _read_game_at(f, offset)
+
+
+if __name__ == "__main__":
+    import argparse
+
+    parser = argparse.ArgumentParser(description="Look at games stored in a replay file.")
+    parser.add_argument("path", help="Replay file, e.g. replays/gen_0001.gcr")
+    parser.add_argument("index", nargs="?", type=int, help="Game to show, leave out to list all games")
+    parser.add_argument("--pgn", action="store_true", help="Print the game as PGN instead of boards")
+    args = parser.parse_args()
+
+    if args.index is None:
+        for i, game in enumerate(iter_games(args.path)):
+            print(f"{i}: {game.white_ident} vs {game.black_ident}, {RESULT_TO_PGN[game.result]} in {len(game)} plies (seed {game.seed})")
+    else:
+        game = read_game(args.path, args.index)
+        if args.pgn:
+            print(game.to_pgn())
+        else:
+            from play_a_game import view_replay
+            view_replay(game.uci_moves())
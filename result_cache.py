@@ -0,0 +1,159 @@
+"""
+Memoized game results. Games are fully determined by (white weights, black weights, search depth, game seed), and
+survivors carry over between generations unchanged, so a rematch with the same seed doesn't need to be played again.
+
+Entries are keyed by a 64-bit hash of each bot's weights plus depth and seed, and hold the result and the moves
+(as 16-bit move codes, see replay.py). The cache keeps at most max_entries games, dropping the least recently used.
+
+With a path, every new result is also appended to a file, and loaded back on the next run, so rerunning the same
+config replays almost nothing. The file is append-only, a fixed header per game followed by its move codes:
+
+    magic      8 bytes
+    per game   white hash u64, black hash u64, depth u8, seed u64, result u8, number of plies u16, then the codes
+
+It gets rewritten with only the entries still cached once it holds twice as many games as the cache does.
+"""
+
+import hashlib
+import os
+import struct
+from array import array
+from collections import OrderedDict
+
+from replay import decode_move, encode_moves
+from search_and_score import WEIGHT_NAMES
+
+
+FILE_MAGIC = b"GCRC\x01\x00\x00\x00" # Name + format version, padded to 8 bytes
+RECORD_HEADER = struct.Struct("<QQBQBH") # white hash, black hash, depth, seed, result, number of plies
+_WEIGHTS_FORMAT = struct.Struct(f"<{len(WEIGHT_NAMES)}d")
+
+
+def weights_hash(weights:dict) -> int:
+    """
+    64-bit hash of a bot's weights (exact float values, in WEIGHT_NAMES order).
+    """
+    packed = _WEIGHTS_FORMAT.pack(*(weights[name] for name in WEIGHT_NAMES))
+    return int.from_bytes(hashlib.blake2b(packed, digest_size=8).digest(), "little")
+
+
+def pairing_seed(run_seed:int, white_weights:dict, black_weights:dict) -> int:
+    """
+    32-bit game seed that only depends on the run seed and who plays whom (in which colors), so a rematch between
+    unchanged bots is the exact same game, and the cache can answer it.
+    """
+    packed = struct.pack("<QQQ", run_seed & 0xFFFFFFFFFFFFFFFF, weights_hash(white_weights), weights_hash(black_weights))
+    return int.from_bytes(hashlib.blake2b(packed, digest_size=4).digest(), "little")
+
+
+class ResultCache:
+
+    def __init__(self, max_entries:int=1 << 16, path:str=None):
+        self.max_entries = max_entries
+        self.path = path
+        self._entries = OrderedDict() # key -> (result, move codes)
+        self.hits = 0
+        self.misses = 0
+        self._file = None
+        self._records_on_disk = 0
+
+        if path is not None:
+            self._load()
+            self._file = open(path, "ab")
+            if self._file.tell() == 0:
+                self._file.write(FILE_MAGIC)
+
+    def _load(self) -> None:
+        if not os.path.exists(self.path):
+            return
+        with open(self.path, "rb") as f:
+            if f.read(len(FILE_MAGIC)) != FILE_MAGIC:
+                raise ValueError(f"{self.path} is not a result cache file")
+            while True:
+                header = f.read(RECORD_HEADER.size)
+                if len(header) < RECORD_HEADER.size:
+                    break
+                white, black, depth, seed, result, n_plies = RECORD_HEADER.unpack(header)
+                codes = array("H")
+                data = f.read(2 * n_plies)
+                if len(data) < 2 * n_plies:
+                    break # A run that died mid-write, everything before it is fine
+                codes.frombytes(data)
+                self._store((white, black, depth, seed), result, codes)
+                self._records_on_disk += 1
+
+    def key(self, white_weights:dict, black_weights:dict, depth:int, seed:int) -> tuple:
+        return (weights_hash(white_weights), weights_hash(black_weights), depth, seed)
+
+    def _store(self, key:tuple, result:int, codes:array) -> None:
+        self._entries[key] = (result, codes)
+        self._entries.move_to_end(key)
+        if len(self._entries) > self.max_entries:
+            self._entries.popitem(last=False)
+
+    def get(self, key:tuple):
+        """
+        (result, moves as UCI strings) of a stored game, or None.
+        """
+        entry = self._entries.get(key)
+        if entry is None:
+            self.misses += 1
+            return None
+        self._entries.move_to_end(key)
+        self.hits += 1
+        result, codes = entry
+        return result, [decode_move(code).uci() for code in codes]
+
+    def put(self, key:tuple, result:int, moves:list) -> None:
+        codes = encode_moves(moves)
+        self._store(key, result, codes)
+        if self._file is not None:
+            self._file.write(RECORD_HEADER.pack(*key, result, len(codes)))
+            self._file.write(codes.tobytes())
+            self._records_on_disk += 1
+
+    def stats(self) -> dict:
+        return {"hits": self.hits, "misses": self.misses, "entries": len(self._entries)}
+
+    def close(self) -> None:
+        if self._file is None:
+            return
+        self._file.close()
+        self._file = None
+        if self._records_on_disk > 2 * self.max_entries:
+            self._compact()
+
+    def _compact(self) -> None:
+        with open(self.path + ".tmp", "wb") as f:
+            f.write(FILE_MAGIC)
+            for key, (result, codes) in self._entries.items():
+                f.write(RECORD_HEADER.pack(*key, result, len(codes)))
+                f.write(codes.tobytes())
+        os.replace(self.path + ".tmp", self.path)
+        self._records_on_disk = len(self._entries)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+
+def play_cached(cache:"ResultCache", tasks:list, play_many):
+    """
+    Yields play_game_task results for (weights_1, weights_2, depth, seed) tasks, in order, answering from the cache
+    where it can and handing only the rest to play_many (e.g. lambda tasks: pool.imap(play_game_task, tasks)).
+    Cached games come back with 0 nodes in their stats, since nothing was searched, and no profile.
+    """
+    keys = [cache.key(*task) for task in tasks]
+    known = [cache.get(key) for key in keys]
+    played = iter(play_many([task for task, hit in zip(tasks, known) if hit is None]))
+
+    for key, hit in zip(keys, known):
+        if hit is not None:
+            result, moves = hit
+            yield result, moves, {"plies": len(moves), "nodes": 0}, None
+        else:
+            result, moves, stats, profile = next(played)
+            cache.put(key, result, moves)
+            yield result, moves, stats, profile
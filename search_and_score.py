@@ -1,6 +1,42 @@
 # This bit of code will simply attempt to build a search tree using python-chess from a starting position.
 
 import chess
+import chess.polyglot
+
+
+# Names of all the weights score_move uses, in the order it applies them. This is the layout of the Bot DNA
+# wherever we need it as a flat vector instead of a dict (history files and such)
+WEIGHT_NAMES = (
+    "friendly_pawn_count",
+    "friendly_knight_count",
+    "friendly_bishop_count",
+    "friendly_rook_count",
+    "friendly_queen_count",
+    "friendly_king_count",
+    "enemy_pawn_count",
+    "enemy_knight_count",
+    "enemy_bishop_count",
+    "enemy_rook_count",
+    "enemy_queen_count",
+    "enemy_king_count",
+    "we_have_more",
+    "friendly_protected_pieces",
+    "friendly_in_check",
+    "enemy_in_check",
+    "friendly_in_checkmate",
+    "enemy_in_checkmate",
+    "enemy_proximity_to_friendly_king",
+    "friendly_proximity_to_enemy_king",
+    "friendly_center_control",
+    "enemy_center_control",
+    "friendly_threatening_unprotected",
+    "enemy_threatening_unprotected",
+    "friendly_pawn_promotion_distance",
+    "enemy_pawn_promotion_distance",
+    "can_castle",
+    "can_en_passant",
+    "num_legal_moves",
+)
 
 
 def build_search_tree(board:chess.Board, depth:int=1) -> dict:
@@ -20,80 +56,66 @@ def build_search_tree(board:chess.Board, depth:int=1) -> dict:
     return tree
 
 
-def score_move(board:chess.Board, is_player_white:bool, weights:dict) -> float:
+def count_nodes(tree:dict) -> int:
     """
-    Returns a score for the given board, evaluating it's "goodness" for the specified player.
-
-    weights is the weighting applied to each rule.
-
-    Rules:
-    Material count , one rule for each piece, in order: pawn, knight, bishop, rook, queen, king, and then again for the opponent's pieces
-    Do we have more pieces than the opponent? (simple yes/no)
-    Number of friendly protected pieces (as in, another piece is covering it)
-    Is the king in check? (2 rules, ours and theirs)
-    Is the king in checkmate? (2 rules, ours and theirs)
-    How close to the king are the enemy pieces? (horizontal and vertical)
-    How close to the enemy king are our pieces? (horizontal and vertical)
-    How many pieces are in the center? (friendly and enemy)
-    How many of pieces are threatening unprotected pieces? (friendly and enemy)
-    How close are pawns to promoting? (as in distance to last row, friendly and enemy)
-    Can we castle? :D
-    Can we En passant? UwU
-    Number of legal moves available
+    Number of nodes (root and leaves included) in a tree as produced by build_search_tree.
     """
+    if 'board' in tree:
+        return 1
+    return 1 + sum(count_nodes(subtree) for subtree in tree.values() if isinstance(subtree, dict))
 
-    score = 0
 
-    friendly_color = chess.WHITE if is_player_white else chess.BLACK
-    enemy_color = chess.BLACK if is_player_white else chess.WHITE
+# The rules score_move is made of. Each one looks at the board from one player's point of view and returns a single number,
+# signed so that a rule's contribution to the score is simply weight * number (a minus means it counts against us).
+# They are split up like this so we can get a feature vector out of a position (extract_features), and so profiling.py
+# can time each rule on its own.
 
-    # Friendly Material rules
-    num_friendly_pawns = len(board.pieces(chess.PAWN, friendly_color))
-    score += weights["friendly_pawn_count"] * num_friendly_pawns
+# Friendly Material rules
+def _friendly_pawn_count(board, friendly_color, enemy_color, is_player_white):
+    return len(board.pieces(chess.PAWN, friendly_color))
 
-    num_friendly_knights = len(board.pieces(chess.KNIGHT, friendly_color))
-    score += weights["friendly_knight_count"] * num_friendly_knights
+def _friendly_knight_count(board, friendly_color, enemy_color, is_player_white):
+    return len(board.pieces(chess.KNIGHT, friendly_color))
 
-    num_friendly_bishops = len(board.pieces(chess.BISHOP, friendly_color))
-    score += weights["friendly_bishop_count"] * num_friendly_bishops
+def _friendly_bishop_count(board, friendly_color, enemy_color, is_player_white):
+    return len(board.pieces(chess.BISHOP, friendly_color))
 
-    num_friendly_rooks = len(board.pieces(chess.ROOK, friendly_color))
-    score += weights["friendly_rook_count"] * num_friendly_rooks
+def _friendly_rook_count(board, friendly_color, enemy_color, is_player_white):
+    return len(board.pieces(chess.ROOK, friendly_color))
 
-    num_friendly_queens = len(board.pieces(chess.QUEEN, friendly_color))
-    score += weights["friendly_queen_count"] * num_friendly_queens
+def _friendly_queen_count(board, friendly_color, enemy_color, is_player_white):
+    return len(board.pieces(chess.QUEEN, friendly_color))
 
-    num_friendly_kings = len(board.pieces(chess.KING, friendly_color))
-    score += weights["friendly_king_count"] * num_friendly_kings
+def _friendly_king_count(board, friendly_color, enemy_color, is_player_white):
+    return len(board.pieces(chess.KING, friendly_color))
 
-    # Enemy Material rules
-    num_enemy_pawns = len(board.pieces(chess.PAWN, enemy_color))
-    score -= weights["enemy_pawn_count"] * num_enemy_pawns
+# Enemy Material rules
+def _enemy_pawn_count(board, friendly_color, enemy_color, is_player_white):
+    return -len(board.pieces(chess.PAWN, enemy_color))
 
-    num_enemy_knights = len(board.pieces(chess.KNIGHT, enemy_color))
-    score -= weights["enemy_knight_count"] * num_enemy_knights
+def _enemy_knight_count(board, friendly_color, enemy_color, is_player_white):
+    return -len(board.pieces(chess.KNIGHT, enemy_color))
 
-    num_enemy_bishops = len(board.pieces(chess.BISHOP, enemy_color))
-    score -= weights["enemy_bishop_count"] * num_enemy_bishops
+def _enemy_bishop_count(board, friendly_color, enemy_color, is_player_white):
+    return -len(board.pieces(chess.BISHOP, enemy_color))
 
-    num_enemy_rooks = len(board.pieces(chess.ROOK, enemy_color))
-    score -= weights["enemy_rook_count"] * num_enemy_rooks
+def _enemy_rook_count(board, friendly_color, enemy_color, is_player_white):
+    return -len(board.pieces(chess.ROOK, enemy_color))
 
-    num_enemy_queens = len(board.pieces(chess.QUEEN, enemy_color))
-    score -= weights["enemy_queen_count"] * num_enemy_queens
+def _enemy_queen_count(board, friendly_color, enemy_color, is_player_white):
+    return -len(board.pieces(chess.QUEEN, enemy_color))
 
-    num_enemy_kings = len(board.pieces(chess.KING, enemy_color))
-    score -= weights["enemy_king_count"] * num_enemy_kings
+def _enemy_king_count(board, friendly_color, enemy_color, is_player_white):
+    return -len(board.pieces(chess.KING, enemy_color))
 
-    # Total piece count
-    total_friendly_pieces = (num_friendly_pawns + num_friendly_knights + num_friendly_bishops +
-                             num_friendly_rooks + num_friendly_queens + num_friendly_kings)
-    total_enemy_pieces = (num_enemy_pawns + num_enemy_knights + num_enemy_bishops +
-                          num_enemy_rooks + num_enemy_queens + num_enemy_kings)
-    
-    score += weights["we_have_more"] * (1 if total_friendly_pieces > total_enemy_pieces else -1)
+# Total piece count
+def _we_have_more(board, friendly_color, enemy_color, is_player_white):
+    total_friendly_pieces = chess.popcount(board.occupied_co[friendly_color])
+    total_enemy_pieces = chess.popcount(board.occupied_co[enemy_color])
+    return 1 if total_friendly_pieces > total_enemy_pieces else -1
 
-    # How many of our pieces are protected
+# How many of our pieces are protected
+def _friendly_protected_pieces(board, friendly_color, enemy_color, is_player_white):
     num_protected_friendly_pieces = 0
     for square in chess.SQUARES:
         piece = board.piece_at(square)
@@ -101,69 +123,66 @@ def score_move(board:chess.Board, is_player_white:bool, weights:dict) -> float:
             attackers = board.attackers(not piece.color, square)
             if attackers:
                 num_protected_friendly_pieces += 1
-    
-    score += weights["friendly_protected_pieces"] * num_protected_friendly_pieces
+    return num_protected_friendly_pieces
 
-    # Are we in check?
-    if board.is_check() and (board.turn == friendly_color):
-        score -= weights["friendly_in_check"]
-    else:
-        score += weights["friendly_in_check"]
+# Are we in check?
+def _friendly_in_check(board, friendly_color, enemy_color, is_player_white):
+    return -1 if board.is_check() and (board.turn == friendly_color) else 1
 
-    # Is enemy in check?
-    if board.is_check() and (board.turn == enemy_color):
-        score += weights["enemy_in_check"]
-    else:
-        score -= weights["enemy_in_check"]
+# Is enemy in check?
+def _enemy_in_check(board, friendly_color, enemy_color, is_player_white):
+    return 1 if board.is_check() and (board.turn == enemy_color) else -1
 
-    # Are we in checkmate
-    if board.is_checkmate() and (board.turn == friendly_color):
-        score -= weights["friendly_in_checkmate"]
-    else:
-        score += weights["friendly_in_checkmate"]
-    
-    # Is enemy in checkmate
-    if board.is_checkmate() and (board.turn == enemy_color):
-        score += weights["enemy_in_checkmate"]
-    else:
-        score -= weights["enemy_in_checkmate"]
-    
-    # How close to our king are enemy pieces
+# Are we in checkmate
+def _friendly_in_checkmate(board, friendly_color, enemy_color, is_player_white):
+    return -1 if board.is_checkmate() and (board.turn == friendly_color) else 1
+
+# Is enemy in checkmate
+def _enemy_in_checkmate(board, friendly_color, enemy_color, is_player_white):
+    return 1 if board.is_checkmate() and (board.turn == enemy_color) else -1
+
+# How close to our king are enemy pieces
+def _enemy_proximity_to_friendly_king(board, friendly_color, enemy_color, is_player_white):
     friendly_king_square = board.king(friendly_color)
     enemy_piece_proximity = 0
     for square in chess.SQUARES:
         piece = board.piece_at(square)
         if piece and piece.color == enemy_color:
             enemy_piece_proximity += chess.square_distance(square, friendly_king_square)
-    score += weights["enemy_proximity_to_friendly_king"] * enemy_piece_proximity
+    return enemy_piece_proximity
 
-    # How close are we to the enemy king
+# How close are we to the enemy king
+def _friendly_proximity_to_enemy_king(board, friendly_color, enemy_color, is_player_white):
     enemy_king_square = board.king(enemy_color)
     friendly_piece_proximity = 0
     for square in chess.SQUARES:
         piece = board.piece_at(square)
         if piece and piece.color == friendly_color:
             friendly_piece_proximity += chess.square_distance(square, enemy_king_square)
-    score -= weights["friendly_proximity_to_enemy_king"] * friendly_piece_proximity
+    return -friendly_piece_proximity
 
-    # Are we in the power position of chess, commonly refered to as "the center"?
-    center_squares = [chess.D4, chess.D5, chess.E4, chess.E5]
+# Are we in the power position of chess, commonly refered to as "the center"?
+CENTER_SQUARES = [chess.D4, chess.D5, chess.E4, chess.E5]
+
+def _friendly_center_control(board, friendly_color, enemy_color, is_player_white):
     num_friendly_center_pieces = 0
-    for square in center_squares:
+    for square in CENTER_SQUARES:
         piece = board.piece_at(square)
         if piece and piece.color == friendly_color:
             num_friendly_center_pieces += 1
-    score += weights["friendly_center_control"] * num_friendly_center_pieces
+    return num_friendly_center_pieces
 
-    # Does the enemy have the center?
+# Does the enemy have the center?
+def _enemy_center_control(board, friendly_color, enemy_color, is_player_white):
     num_enemy_center_pieces = 0
-    for square in center_squares:
+    for square in CENTER_SQUARES:
         piece = board.piece_at(square)
         if piece and piece.color == enemy_color:
             num_enemy_center_pieces += 1
-    score -= weights["enemy_center_control"] * num_enemy_center_pieces
+    return -num_enemy_center_pieces
 
-    # Are we threatening unprotected enemy pieces?
+# Are we threatening unprotected enemy pieces?
+def _friendly_threatening_unprotected(board, friendly_color, enemy_color, is_player_white):
     unprotected_enemies = 0
     for square in chess.SQUARES:
         piece = board.piece_at(square)
@@ -172,9 +191,10 @@ def score_move(board:chess.Board, is_player_white:bool, weights:dict) -> float:
             defenders = board.attackers(enemy_color, square)
             if attackers and not defenders:
                 unprotected_enemies += 1
-    score += weights["friendly_threatening_unprotected"] * unprotected_enemies
+    return unprotected_enemies
 
-    # Is the enemy threatening unprotected friendly pieces?
+# Is the enemy threatening unprotected friendly pieces?
+def _enemy_threatening_unprotected(board, friendly_color, enemy_color, is_player_white):
     unprotected_friendlies = 0
     for square in chess.SQUARES:
         piece = board.piece_at(square)
@@ -183,9 +203,10 @@ def score_move(board:chess.Board, is_player_white:bool, weights:dict) -> float:
             defenders = board.attackers(friendly_color, square)
             if attackers and not defenders:
                 unprotected_friendlies += 1
-    score -= weights["enemy_threatening_unprotected"] * unprotected_friendlies
+    return -unprotected_friendlies
 
-    # How close are friendly pawns to promoting?
+# How close are friendly pawns to promoting?
+def _friendly_pawn_promotion_distance(board, friendly_color, enemy_color, is_player_white):
     friendly_pawn_promotion_distance = 0
     for square in board.pieces(chess.PAWN, friendly_color):
         rank = chess.square_rank(square)
@@ -193,9 +214,10 @@ def score_move(board:chess.Board, is_player_white:bool, weights:dict) -> float:
             friendly_pawn_promotion_distance += (9 - rank)
         else:
             friendly_pawn_promotion_distance += rank
-    score -= weights["friendly_pawn_promotion_distance"] * friendly_pawn_promotion_distance
+    return -friendly_pawn_promotion_distance
 
-    # How close are enemy pawns to promoting?
+# How close are enemy pawns to promoting?
+def _enemy_pawn_promotion_distance(board, friendly_color, enemy_color, is_player_white):
     enemy_pawn_promotion_distance = 0
     for square in board.pieces(chess.PAWN, enemy_color):
         rank = chess.square_rank(square)
@@ -203,23 +225,101 @@ def score_move(board:chess.Board, is_player_white:bool, weights:dict) -> float:
             enemy_pawn_promotion_distance += rank
         else:
             enemy_pawn_promotion_distance += (9 - rank)
-    score += weights["enemy_pawn_promotion_distance"] * enemy_pawn_promotion_distance
+    return enemy_pawn_promotion_distance
 
-    # Can we castle?
+# Can we castle?
+def _can_castle(board, friendly_color, enemy_color, is_player_white):
     if board.has_kingside_castling_rights(friendly_color) or board.has_queenside_castling_rights(friendly_color):
-        score -= weights["can_castle"]
-    else:
-        score += weights["can_castle"]
-    
-    # Can we En passant?
-    if board.has_legal_en_passant():
-        score += weights["can_en_passant"]
-    else:
-        score -= weights["can_en_passant"]
-    
-    # Number of legal moves available
-    num_legal_moves = board.legal_moves.count()
-    score += weights["num_legal_moves"] * num_legal_moves
+        return -1
+    return 1
+
+# Can we En passant?
+def _can_en_passant(board, friendly_color, enemy_color, is_player_white):
+    return 1 if board.has_legal_en_passant() else -1
+
+# Number of legal moves available
+def _num_legal_moves(board, friendly_color, enemy_color, is_player_white):
+    return board.legal_moves.count()
+
+
+# Every rule, in WEIGHT_NAMES order. extract_features looks this up on every call, which is how profiling.py swaps in timed versions
+RULES = tuple(globals()["_" + name] for name in WEIGHT_NAMES)
+
+
+def extract_features(board:chess.Board, is_player_white:bool) -> list:
+    """
+    Runs every rule on the board and returns their values in WEIGHT_NAMES order.
+    The score for some weights is then just the dot product of the two, which is exactly what score_move does.
+    """
+    friendly_color = chess.WHITE if is_player_white else chess.BLACK
+    enemy_color = chess.BLACK if is_player_white else chess.WHITE
+    return [rule(board, friendly_color, enemy_color, is_player_white) for rule in RULES]
+
+
+# Feature caches position_features asks before running the rules itself, in order. Anything with
+# get(key) -> list or None and put(key, features) works, see feature_cache.py
+FEATURE_CACHES = []
+
+# Features depend on whose point of view we look from, so black's view gets its own key
+_BLACK_VIEW_KEY = 0x9E3779B97F4A7C15
+
+
+def register_feature_cache(cache) -> None:
+    FEATURE_CACHES.append(cache)
+
+
+def position_key(board:chess.Board, is_player_white:bool) -> int:
+    """
+    64-bit key of a position as seen by one player: its Zobrist hash, flipped for black's point of view.
+    """
+    key = chess.polyglot.zobrist_hash(board)
+    return key if is_player_white else key ^ _BLACK_VIEW_KEY
+
+
+def position_features(board:chess.Board, is_player_white:bool) -> list:
+    """
+    Same as extract_features, but goes through the registered feature caches first (and fills them on a miss).
+    """
+    if not FEATURE_CACHES:
+        return extract_features(board, is_player_white)
+
+    key = position_key(board, is_player_white)
+    for cache in FEATURE_CACHES:
+        features = cache.get(key)
+        if features is not None:
+            return features
+
+    features = extract_features(board, is_player_white)
+    for cache in FEATURE_CACHES:
+        cache.put(key, features)
+    return features
+
+
+def score_move(board:chess.Board, is_player_white:bool, weights:dict) -> float:
+    """
+    Returns a score for the given board, evaluating it's "goodness" for the specified player.
+
+    weights is the weighting applied to each rule.
+
+    Rules:
+    Material count , one rule for each piece, in order: pawn, knight, bishop, rook, queen, king, and then again for the opponent's pieces
+    Do we have more pieces than the opponent? (simple yes/no)
+    Number of friendly protected pieces (as in, another piece is covering it)
+    Is the king in check? (2 rules, ours and theirs)
+    Is the king in checkmate? (2 rules, ours and theirs)
+    How close to the king are the enemy pieces? (horizontal and vertical)
+    How close to the enemy king are our pieces? (horizontal and vertical)
+    How many pieces are in the center? (friendly and enemy)
+    How many of pieces are threatening unprotected pieces? (friendly and enemy)
+    How close are pawns to promoting? (as in distance to last row, friendly and enemy)
+    Can we castle? :D
+    Can we En passant? UwU
+    Number of legal moves available
+    """
+
+    score = 0
+    for name, feature in zip(WEIGHT_NAMES, position_features(board, is_player_white)):
+        score += weights[name] * feature
 
     return score
 
@@ -0,0 +1,240 @@
+"""
+Compact search trees, for when we want to keep the whole tree around (debugging why a bot picked a move, visualising it)
+instead of the nested dicts of build_search_tree, which take megabytes of python objects at depth 3.
+
+A SearchTree is a handful of flat numpy arrays with one entry per node, in depth first (pre)order:
+
+    parent       int32    index of the parent node, -1 for the root
+    move         uint16   move leading to the node, packed like replay.py does it (0 for the root)
+    depth        uint8    plies from the root
+    end          int32    one past the last node of the node's subtree
+    score        float64  score_tree's score for the node (NaN if the tree wasn't scored)
+    feature_row  int32    row of the node in features, -1 if it has none (only with features)
+    features     float32  [n_leaves, n_features] the leaves' feature vectors (only with features)
+
+Pre-order means every subtree is one contiguous slice, node i up to end[i], and a node's children are found by hopping
+from one child's end to the next. That's about 19 bytes per node, so a depth 3 tree from the start position
+(9323 nodes) is around 180 KB.
+"""
+
+from array import array
+
+import chess
+import numpy as np
+
+import search_and_score
+from replay import decode_move, encode_move
+
+
+class SearchTree:
+
+    def __init__(self, root_fen:str, search_depth:int, parent:np.ndarray, move:np.ndarray, depth:np.ndarray, end:np.ndarray,
+                 score:np.ndarray, feature_row:np.ndarray=None, features:np.ndarray=None):
+        self.root_fen = root_fen
+        self.search_depth = search_depth # Depth of the leaves, shallower nodes without children had no legal moves
+        self.parent = parent
+        self.move = move
+        self.depth = depth
+        self.end = end
+        self.score = score
+        self.feature_row = feature_row
+        self.features = features
+
+    def __len__(self):
+        return len(self.parent)
+
+    @property
+    def nbytes(self) -> int:
+        arrays = (self.parent, self.move, self.depth, self.end, self.score, self.feature_row, self.features)
+        return sum(a.nbytes for a in arrays if a is not None)
+
+    def subtree_end(self, node:int) -> int:
+        """
+        One past the last node of node's subtree.
+        """
+        return int(self.end[node])
+
+    def children(self, node:int) -> np.ndarray:
+        children = []
+        child, end = node + 1, int(self.end[node])
+        while child < end:
+            children.append(child)
+            child = int(self.end[child])
+        return np.array(children, dtype=np.int64)
+
+    def is_leaf(self, node:int) -> bool:
+        return int(self.end[node]) == node + 1
+
+    def best_child(self, node:int=0):
+        """
+        The highest scored child of node (the first one on ties, like analyze_positions), None if it has no children.
+        """
+        children = self.children(node)
+        if len(children) == 0:
+            return None
+        return int(children[np.argmax(self.score[children])])
+
+    def path(self, node:int) -> list:
+        """
+        The moves from the root to node, as chess.Move objects.
+        """
+        moves = []
+        while node > 0:
+            moves.append(decode_move(int(self.move[node])))
+            node = int(self.parent[node])
+        return moves[::-1]
+
+    def board_at(self, node:int) -> chess.Board:
+        board = chess.Board(self.root_fen)
+        for move in self.path(node):
+            board.push(move)
+        return board
+
+    def subtree(self, node:int) -> "SearchTree":
+        """
+        node and everything below it as a tree of its own (copies, rooted at node's position).
+        """
+        end = self.subtree_end(node)
+        parent = self.parent[node:end] - node
+        parent[0] = -1
+        move = self.move[node:end].copy()
+        move[0] = 0
+        feature_row = features = None
+        if self.feature_row is not None:
+            rows = self.feature_row[node:end]
+            used = rows[rows >= 0]
+            features = self.features[used]
+            feature_row = np.full(len(rows), -1, dtype=np.int32)
+            feature_row[rows >= 0] = np.arange(len(used), dtype=np.int32)
+        return SearchTree(self.board_at(node).fen(), self.search_depth - int(self.depth[node]), parent, move,
+                          self.depth[node:end] - self.depth[node], self.end[node:end] - node, self.score[node:end].copy(),
+                          feature_row, features)
+
+    def to_dict(self, node:int=0) -> dict:
+        """
+        node's subtree in the nested dict format of build_search_tree / score_tree (UCI keys, "score" once scored,
+        "board" FENs on the leaves at full depth), for code that wants the old format.
+        """
+        board = self.board_at(node)
+
+        def walk(i):
+            if self.depth[i] == self.search_depth:
+                tree = {"board": board.fen()}
+            else:
+                tree = {}
+                for child in self.children(i):
+                    move = decode_move(int(self.move[child]))
+                    board.push(move)
+                    tree[move.uci()] = walk(int(child))
+                    board.pop()
+            if not np.isnan(self.score[i]):
+                tree["score"] = float(self.score[i])
+            return tree
+
+        return walk(node)
+
+    def save(self, path:str) -> None:
+        arrays = {"parent": self.parent, "move": self.move, "depth": self.depth, "end": self.end, "score": self.score,
+                  "root_fen": np.array(self.root_fen), "search_depth": np.array(self.search_depth)}
+        if self.feature_row is not None:
+            arrays["feature_row"] = self.feature_row
+            arrays["features"] = self.features
+        np.savez(path, **arrays)
+
+    @classmethod
+    def load(cls, path:str) -> "SearchTree":
+        with np.load(path) as data:
+            return cls(str(data["root_fen"]), int(data["search_depth"]), data["parent"], data["move"], data["depth"],
+                       data["end"], data["score"], data["feature_row"] if "feature_row" in data else None,
+                       data["features"] if "features" in data else None)
+
+
+def build_tree(board:chess.Board, depth:int=1, weights:dict=None, is_player_white:bool=None,
+               with_features:bool=False) -> SearchTree:
+    """
+    Searches board to depth, writing the tree straight into arrays. Same nodes and order as build_search_tree.
+    With weights, every node gets its score_tree score on the way (from is_player_white's point of view, by default
+    the side to move). with_features keeps every leaf's feature vector (it's computed anyway when scoring).
+    """
+    if is_player_white is None:
+        is_player_white = board.turn == chess.WHITE
+    board = board.copy()
+
+    parent = array("i")
+    moves = array("H")
+    depths = array("B")
+    ends = array("i")
+    scores = array("d")
+    feature_rows = array("i")
+    features = []
+    score = weights is not None
+    nan = float("nan")
+
+    def leaf_score(node):
+        if with_features:
+            row = search_and_score.position_features(board, is_player_white)
+            feature_rows[node] = len(features)
+            features.append(row)
+            if score:
+                return sum(weights[name] * feature for name, feature in zip(search_and_score.WEIGHT_NAMES, row))
+            return nan
+        if score:
+            return search_and_score.score_move(board, is_player_white, weights)
+        return nan
+
+    def walk(parent_index, move_code, ply):
+        node = len(parent)
+        parent.append(parent_index)
+        moves.append(move_code)
+        depths.append(ply)
+        ends.append(node + 1)
+        scores.append(nan)
+        feature_rows.append(-1)
+
+        if ply == depth:
+            scores[node] = leaf_score(node)
+            return scores[node]
+
+        best = None
+        for move in board.legal_moves:
+            board.push(move)
+            child_score = walk(node, encode_move(move), ply + 1)
+            board.pop()
+            if score and (best is None or child_score > best):
+                best = child_score
+        ends[node] = len(parent) # Everything appended since this node is its subtree
+        if score:
+            scores[node] = 0 if best is None else best # No moves available
+        return scores[node]
+
+    walk(-1, 0, 0)
+
+    tree = SearchTree(board.fen(), depth, np.frombuffer(parent, dtype=np.int32).copy(), np.frombuffer(moves, dtype=np.uint16).copy(),
+                      np.frombuffer(depths, dtype=np.uint8).copy(), np.frombuffer(ends, dtype=np.int32).copy(),
+                      np.frombuffer(scores, dtype=np.float64).copy())
+    if with_features:
+        tree.feature_row = np.frombuffer(feature_rows, dtype=np.int32).copy()
+        tree.features = np.array(features, dtype=np.float32).reshape(-1, len(search_and_score.WEIGHT_NAMES))
+    return tree
+
+
+if __name__ == "__main__":
+    import argparse
+    from analyze_positions import add_weights_arguments, weights_from_args
+
+    parser = argparse.ArgumentParser(description="Build a bot's search tree for one position and save it as .npz.")
+    parser.add_argument("--fen", default=chess.STARTING_FEN)
+    parser.add_argument("--depth", type=int, default=2)
+    parser.add_argument("--features", action="store_true", help="Keep the leaves' feature vectors")
+    parser.add_argument("-o", "--output", help="Where to save the tree")
+    add_weights_arguments(parser)
+    args = parser.parse_args()
+
+    tree = build_tree(chess.Board(args.fen), args.depth, weights_from_args(args), with_features=args.features)
+    print(f"{len(tree)} nodes, {tree.nbytes / 1024:.0f} KB")
+    node, line = 0, []
+    while (node := tree.best_child(node)) is not None:
+        line.append(decode_move(int(tree.move[node])).uci())
+    print(f"Best line: {' '.join(line)} (score {tree.score[0]:.2f})")
+    if args.output:
+        tree.save(args.output)
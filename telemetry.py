@@ -0,0 +1,212 @@
+"""
+Live numbers for long GA runs: games and nodes per second, plies per game, generation wall time, ETA and cache hit rates.
+
+The GA feeds a Telemetry object (start_generation / record_game / end_generation), which
+- appends a JSON snapshot to a rolling metrics file (unless metrics_path is None or "") every few seconds and at the end of every generation
+  (when the file gets too big it is rotated to metrics.jsonl.1, .2, ... like log files)
+- optionally serves the same numbers in Prometheus text format on http://127.0.0.1:<port>/metrics
+
+Caches register a function returning {"hits": .., "misses": ..} with register_cache, and show up as hit rates.
+"""
+
+import json
+import os
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+
+class Telemetry:
+
+    def __init__(self, total_generations:int, metrics_path:str="metrics.jsonl", write_interval:float=10.0,
+                 max_bytes:int=5_000_000, backups:int=3, http_port:int=None):
+        self.total_generations = total_generations
+        self.metrics_path = metrics_path
+        self.write_interval = write_interval
+        self.max_bytes = max_bytes
+        self.backups = backups
+
+        self._lock = threading.Lock()
+        self._caches = {}
+        self._run_start = time.time()
+        self._last_write = 0.0
+
+        self.generation = 0
+        self.generations_done = 0
+        self.games = 0
+        self.plies = 0
+        self.nodes = 0
+        self.gen_start = self._run_start
+        self.gen_games = 0
+        self.gen_nodes = 0
+        self.last_generation_seconds = 0.0
+        self.total_generation_seconds = 0.0
+
+        self._server = None
+        if http_port is not None:
+            self._serve(http_port)
+
+    def register_cache(self, name:str, stats) -> None:
+        """
+        stats is a function returning a dict with at least "hits" and "misses".
+        """
+        self._caches[name] = stats
+
+    def start_generation(self, generation:int) -> None:
+        with self._lock:
+            self.generation = generation
+            self.gen_start = time.time()
+            self.gen_games = 0
+            self.gen_nodes = 0
+
+    def record_game(self, plies:int, nodes:int=0) -> None:
+        with self._lock:
+            self.games += 1
+            self.plies += plies
+            self.nodes += nodes
+            self.gen_games += 1
+            self.gen_nodes += nodes
+        if time.time() - self._last_write >= self.write_interval:
+            self.write()
+
+    def end_generation(self) -> None:
+        with self._lock:
+            self.last_generation_seconds = time.time() - self.gen_start
+            self.total_generation_seconds += self.last_generation_seconds
+            self.generations_done += 1
+        self.write()
+
+    def snapshot(self) -> dict:
+        """
+        All the current numbers as a flat dict.
+        """
+        now = time.time()
+        with self._lock:
+            gen_elapsed = now - self.gen_start
+            # Rates over the running generation, falling back to the whole run right after a generation started
+            if self.gen_games and gen_elapsed > 0:
+                games_per_second = self.gen_games / gen_elapsed
+                nodes_per_second = self.gen_nodes / gen_elapsed
+            else:
+                run_elapsed = max(now - self._run_start, 1e-9)
+                games_per_second = self.games / run_elapsed
+                nodes_per_second = self.nodes / run_elapsed
+
+            avg_generation = self.total_generation_seconds / self.generations_done if self.generations_done else None
+            remaining = self.total_generations - self.generations_done
+            eta = None if avg_generation is None else max(avg_generation * remaining - (gen_elapsed if self.generation > self.generations_done else 0), 0.0)
+
+            snap = {
+                "time": now,
+                "generation": self.generation,
+                "total_generations": self.total_generations,
+                "games": self.games,
+                "plies": self.plies,
+                "nodes": self.nodes,
+                "plies_per_game": self.plies / self.games if self.games else 0.0,
+                "games_per_second": games_per_second,
+                "nodes_per_second": nodes_per_second,
+                "generation_elapsed_seconds": gen_elapsed,
+                "last_generation_seconds": self.last_generation_seconds,
+                "eta_seconds": eta,
+                "caches": {},
+            }
+
+        for name, stats in self._caches.items():
+            cache = dict(stats())
+            lookups = cache["hits"] + cache["misses"]
+            cache["hit_rate"] = cache["hits"] / lookups if lookups else 0.0
+            snap["caches"][name] = cache
+        return snap
+
+    def write(self) -> None:
+        """
+        Appends a snapshot to the metrics file, rotating it first if it got too big.
+        """
+        if not self.metrics_path:
+            return # None or "" (e.g. --metrics-path "") means no metrics file
+        self._last_write = time.time()
+        if os.path.exists(self.metrics_path) and os.path.getsize(self.metrics_path) > self.max_bytes:
+            for i in range(self.backups - 1, 0, -1):
+                if os.path.exists(f"{self.metrics_path}.{i}"):
+                    os.replace(f"{self.metrics_path}.{i}", f"{self.metrics_path}.{i + 1}")
+            os.replace(self.metrics_path, f"{self.metrics_path}.1")
+        with open(self.metrics_path, "a") as f:
+            f.write(json.dumps(self.snapshot()) + "\n")
+
+    def prometheus_text(self) -> str:
+        """
+        The current snapshot in the Prometheus text exposition format.
+        """
+        snap = self.snapshot()
+        lines = []
+
+        def metric(name, kind, help_text, value, labels=None):
+            if value is None:
+                return
+            if not any(line.startswith(f"# TYPE gcb_{name} ") for line in lines):
+                lines.append(f"# HELP gcb_{name} {help_text}")
+                lines.append(f"# TYPE gcb_{name} {kind}")
+            label_text = "{" + ",".join(f'{k}="{v}"' for k, v in labels.items()) + "}" if labels else ""
+            lines.append(f"gcb_{name}{label_text} {value}")
+
+        metric("generation", "gauge", "Generation currently running", snap["generation"])
+        metric("total_generations", "gauge", "Generations this run will do", snap["total_generations"])
+        metric("games_total", "counter", "Games played", snap["games"])
+        metric("plies_total", "counter", "Plies played", snap["plies"])
+        metric("nodes_total", "counter", "Search tree nodes generated", snap["nodes"])
+        metric("plies_per_game", "gauge", "Average plies per game", snap["plies_per_game"])
+        metric("games_per_second", "gauge", "Games per second in the running generation", snap["games_per_second"])
+        metric("nodes_per_second", "gauge", "Nodes per second in the running generation", snap["nodes_per_second"])
+        metric("generation_elapsed_seconds", "gauge", "Wall time of the running generation so far", snap["generation_elapsed_seconds"])
+        metric("last_generation_seconds", "gauge", "Wall time of the last finished generation", snap["last_generation_seconds"])
+        metric("eta_seconds", "gauge", "Estimated time until the run is done", snap["eta_seconds"])
+        for name, cache in snap["caches"].items():
+            metric("cache_hits_total", "counter", "Cache hits", cache["hits"], {"cache": name})
+            metric("cache_misses_total", "counter", "Cache misses", cache["misses"], {"cache": name})
+            metric("cache_hit_rate", "gauge", "Cache hit rate", cache["hit_rate"], {"cache": name})
+
+        return "\n".join(lines) + "\n"
+
+    def _serve(self, port:int) -> None:
+        telemetry = self
+
+        class MetricsHandler(BaseHTTPRequestHandler):
+            def do_GET(self):
+                if self.path not in ("/", "/metrics"):
+                    self.send_error(404)
+                    return
+                body = telemetry.prometheus_text().encode()
+                self.send_response(200)
+                self.send_header("Content-Type", "text/plain; version=0.0.4")
+                self.send_header("Content-Length", str(len(body)))
+                self.end_headers()
+                self.wfile.write(body)
+
+            def log_message(self, *args):
+                pass # No access log spam in the middle of our generation prints
+
+        self._server = ThreadingHTTPServer(("127.0.0.1", port), MetricsHandler)
+        threading.Thread(target=self._server.serve_forever, name="metrics-http", daemon=True).start()
+
+    def format_generation(self) -> str:
+        """
+        One line for the console at the end of a generation.
+        """
+        snap = self.snapshot()
+        eta = "?" if snap["eta_seconds"] is None else f"{snap['eta_seconds'] / 60:.1f} min"
+        text = (f"Generation took {snap['last_generation_seconds']:.1f}s, {snap['plies_per_game']:.1f} plies/game, "
+                f"{snap['games_per_second']:.2f} games/s, {snap['nodes_per_second']:.0f} nodes/s, ETA {eta}")
+        for name, cache in snap["caches"].items():
+            text += f", {name} hit rate {100 * cache['hit_rate']:.1f}%"
+        return text
+
+    def close(self) -> None:
+        try:
+            self.write()
+        finally:
+            # Even if the last write fails, the server thread has to go and give the port back
+            if self._server is not None:
+                self._server.shutdown()
+                self._server.server_close()
+                self._server = None
@@ -0,0 +1,291 @@
+"""
+An evolved bot as a UCI engine, so it can play through any standard driver (cutechess, a GUI, python-chess's engine module...).
+
+    python uci_engine.py --history history --generation 100
+    python uci_engine.py --weights champion.json --opening-book opening_book
+
+The weights are loaded once, and the transposition table and feature cache live as long as the process does, so every
+position / go after the first one profits from what earlier searches already figured out.
+
+It searches exactly like play_game does (a position is worth the best leaf below it, see score_tree), but node by node,
+with iterative deepening, so it can stop at a movetime, a node budget, a stop command or a depth.
+Ties go to the first move in legal move order.
+"""
+
+import argparse
+import sys
+import threading
+import time
+
+import chess
+
+import search_and_score
+from analyze_positions import add_weights_arguments, weights_from_args
+from feature_cache import LocalFeatureCache
+
+
+ENGINE_NAME = "GeneticChessBot"
+MAX_DEPTH = 64
+DEFAULT_HASH_MB = 64
+TT_ENTRY_BYTES = 120 # Rough size of one transposition table entry in a python dict
+
+
+class _SearchAborted(Exception):
+    pass
+
+
+class Engine:
+
+    def __init__(self, weights:dict, hash_mb:int=DEFAULT_HASH_MB, opening_book_path:str=None, out=sys.stdout):
+        self.weights = weights
+        self.out = out
+        self._out_lock = threading.Lock()
+
+        self.board = chess.Board()
+        self.tt = {} # (position_key, depth left) -> value
+        self.tt_max_entries = hash_mb * 1_000_000 // TT_ENTRY_BYTES
+        self.feature_cache = LocalFeatureCache()
+        self.opening_book_path = opening_book_path
+        self._install_caches()
+
+        self._stop = threading.Event()
+        self._quit = threading.Event()
+        self._search_thread = None
+        self._infinite = False
+        self.nodes = 0
+        self._deadline = None
+        self._node_limit = None
+
+    def _install_caches(self) -> None:
+        caches = []
+        if self.opening_book_path:
+            from opening_book import OpeningBook
+            caches.append(OpeningBook(self.opening_book_path))
+        caches.append(self.feature_cache)
+        search_and_score.FEATURE_CACHES[:] = caches
+
+    def send(self, line:str) -> None:
+        with self._out_lock:
+            self.out.write(line + "\n")
+            self.out.flush()
+
+    ##############
+    ## SEARCH ####
+    ##############
+
+    def _check_limits(self) -> None:
+        if self._stop.is_set():
+            raise _SearchAborted
+        if self._node_limit is not None and self.nodes >= self._node_limit:
+            raise _SearchAborted
+        # Every node: a node costs a whole feature extraction, next to that reading the clock is free
+        if self._deadline is not None and time.perf_counter() >= self._deadline:
+            raise _SearchAborted
+
+    def _value(self, board:chess.Board, depth:int, is_white:bool) -> float:
+        """
+        What the searching side thinks the position is worth with depth plies left: the best leaf below it,
+        0 if it has no moves (same as score_tree).
+        """
+        self.nodes += 1
+        self._check_limits()
+        if depth == 0:
+            return search_and_score.score_move(board, is_white, self.weights)
+
+        key = (search_and_score.position_key(board, is_white), depth)
+        value = self.tt.get(key)
+        if value is not None:
+            return value
+
+        best = None
+        for move in board.legal_moves:
+            board.push(move)
+            child_value = self._value(board, depth - 1, is_white)
+            board.pop()
+            if best is None or child_value > best:
+                best = child_value
+        value = 0 if best is None else best
+
+        if len(self.tt) >= self.tt_max_entries:
+            self.tt.clear()
+        self.tt[key] = value
+        return value
+
+    def search(self, max_depth:int=MAX_DEPTH, movetime:float=None, nodes:int=None) -> tuple:
+        """
+        Iterative deepening from self.board until a limit hits. movetime is in seconds.
+        Returns (best move, score, depth it was found at), the move is None if there are no legal moves.
+        """
+        self.nodes = 0
+        self._node_limit = nodes
+        self._deadline = None if movetime is None else time.perf_counter() + movetime
+        start = time.perf_counter()
+
+        board = self.board.copy()
+        is_white = board.turn == chess.WHITE
+        root_moves = list(board.legal_moves)
+        if not root_moves:
+            return None, 0, 0
+
+        best_move, best_score, best_depth = root_moves[0], None, 0
+        for depth in range(1, max_depth + 1):
+            try:
+                scores = []
+                for move in root_moves:
+                    board.push(move)
+                    scores.append(self._value(board, depth - 1, is_white))
+                    board.pop()
+            except _SearchAborted:
+                break
+
+            best_index = max(range(len(root_moves)), key=lambda i: (scores[i], -i)) # First move wins ties
+            best_move, best_score, best_depth = root_moves[best_index], scores[best_index], depth
+            elapsed = time.perf_counter() - start
+            self.send(f"info depth {depth} score cp {int(round(best_score))} nodes {self.nodes} "
+                      f"nps {int(self.nodes / max(elapsed, 1e-9))} time {int(elapsed * 1000)} pv {best_move.uci()}")
+
+        return best_move, best_score, best_depth
+
+    ###########
+    ## UCI ####
+    ###########
+
+    def _go(self, tokens:list) -> None:
+        args = {}
+        i = 0
+        while i < len(tokens):
+            if tokens[i] in ("infinite", "ponder"):
+                args[tokens[i]] = True
+                i += 1
+            elif i + 1 < len(tokens):
+                args[tokens[i]] = tokens[i + 1]
+                i += 2
+            else:
+                i += 1
+
+        max_depth = int(args.get("depth", MAX_DEPTH))
+        nodes = int(args["nodes"]) if "nodes" in args else None
+        movetime = None
+        if "movetime" in args:
+            movetime = int(args["movetime"]) / 1000
+        elif not args.get("infinite"):
+            # Simple clock handling: a 30th of what's left plus half the increment
+            side = "w" if self.board.turn == chess.WHITE else "b"
+            if f"{side}time" in args:
+                movetime = (int(args[f"{side}time"]) / 30 + int(args.get(f"{side}inc", 0)) / 2) / 1000
+
+        def run():
+            best_move, _, _ = self.search(max_depth=max_depth, movetime=movetime, nodes=nodes)
+            if self._quit.is_set():
+                return # Nobody's listening anymore, and the move might not even have been searched
+            self.send(f"bestmove {best_move.uci() if best_move else '0000'}")
+
+        self._stop.clear()
+        # Without a time, node or real depth limit only stop ends the search (a bare "go" is that, too)
+        self._infinite = bool(args.get("infinite")) or (movetime is None and nodes is None and max_depth >= MAX_DEPTH)
+        self._search_thread = threading.Thread(target=run, name="search", daemon=True)
+        self._search_thread.start()
+
+    def _stop_search(self) -> None:
+        if self._search_thread is not None:
+            self._stop.set()
+            self._search_thread.join()
+            self._search_thread = None
+
+    def _wait_search(self) -> None:
+        """
+        Lets a running search finish (a GUI waits for bestmove anyway, a script piping commands in shouldn't lose it).
+        Searches without any limit only end with stop, so those get stopped.
+        """
+        if self._infinite:
+            self._stop_search()
+        elif self._search_thread is not None:
+            self._search_thread.join()
+            self._search_thread = None
+
+    def _position(self, tokens:list) -> None:
+        if not tokens:
+            return
+        if tokens[0] == "startpos":
+            board = chess.Board()
+            rest = tokens[1:]
+        elif tokens[0] == "fen":
+            fen_end = tokens.index("moves") if "moves" in tokens else len(tokens)
+            board = chess.Board(" ".join(tokens[1:fen_end]))
+            rest = tokens[fen_end:]
+        else:
+            return
+        if rest and rest[0] == "moves":
+            for uci in rest[1:]:
+                board.push_uci(uci)
+        self.board = board
+
+    def _setoption(self, tokens:list) -> None:
+        text = " ".join(tokens)
+        name, _, value = text.partition(" value ")
+        name = name.replace("name", "", 1).strip().lower()
+        value = value.strip()
+        if name == "hash":
+            self.tt_max_entries = int(value) * 1_000_000 // TT_ENTRY_BYTES
+            self.tt.clear()
+        elif name == "clear hash":
+            self.tt.clear()
+        elif name == "openingbook":
+            self.opening_book_path = value if value and value != "<empty>" else None
+            self._install_caches()
+
+    def handle(self, line:str) -> bool:
+        """
+        Handles one line of UCI input. Returns False once it's time to quit.
+        """
+        tokens = line.split()
+        if not tokens:
+            return True
+        command, tokens = tokens[0], tokens[1:]
+
+        if command == "uci":
+            self.send(f"id name {ENGINE_NAME}")
+            self.send("id author GeneticChessBots")
+            self.send(f"option name Hash type spin default {DEFAULT_HASH_MB} min 1 max 65536")
+            self.send("option name Clear Hash type button")
+            self.send(f"option name OpeningBook type string default {self.opening_book_path or '<empty>'}")
+            self.send("uciok")
+        elif command == "isready":
+            self.send("readyok")
+        elif command == "setoption":
+            self._setoption(tokens)
+        elif command == "ucinewgame":
+            self._wait_search() # Caches stay warm, the bot's opinion of a position doesn't change between games
+        elif command == "position":
+            self._wait_search()
+            self._position(tokens)
+        elif command == "go":
+            self._wait_search()
+            self._go(tokens)
+        elif command == "stop":
+            self._stop_search()
+        elif command == "quit":
+            self._quit.set()
+            self._stop_search()
+            return False
+        return True
+
+    def run(self, stream=sys.stdin) -> None:
+        for line in stream:
+            if not self.handle(line):
+                break
+        self._wait_search()
+
+
+def main(argv:list=None) -> None:
+    parser = argparse.ArgumentParser(description="Run an evolved bot as a UCI engine on stdin / stdout.")
+    parser.add_argument("--hash", type=int, default=DEFAULT_HASH_MB, help="Transposition table size in MB (roughly)")
+    parser.add_argument("--opening-book", help="Opening book directory to take known features from (see opening_book.py)")
+    add_weights_arguments(parser)
+    args = parser.parse_args(argv)
+
+    Engine(weights_from_args(args), hash_mb=args.hash, opening_book_path=args.opening_book).run()
+
+
+if __name__ == "__main__":
+    main()
@@ -1,38 +1,108 @@
-import pandas as pd
+import numpy as np
 import plotly.express as px
+import plotly.graph_objects as go
 
-df = pd.read_csv("history.csv", sep=";")
-
-def extract_weights(weight_str):
-    weight_str = weight_str.strip("{}")
-    weights = {}
-    for pair in weight_str.split(","):
-        key, value = pair.split(":")
-        weights[key.strip().strip("'").strip('"')] = float(value)
-    return weights
-
-df['Weights Dict'] = df['Weights'].apply(extract_weights)
-
-# And now make the dicts into actual columns, so we can plot them more easily
-scores_df = pd.json_normalize(df['Score'])
-df = pd.concat([df, scores_df], axis=1)
-weights_df = pd.json_normalize(df['Weights Dict'])
-df = pd.concat([df, weights_df], axis=1)
-
-"""# Weights per generation
-fig = px.histogram(
-    df,
-    x=list(weights_df.columns),
-    animation_frame="Generation",
-    nbins=100)
-fig.show()"""
-
-# Fitness per weight
-fig = px.scatter(
-    df,
-    x=list(weights_df.columns),
-    y="Fitness",
-    animation_frame="Generation"
-)
-fig.show()
+from history_store import load_dataframe, load_summary
+from search_and_score import WEIGHT_NAMES
 
+
+#####################################
+## PLOTS FROM GENERATION SUMMARIES ##
+#####################################
+
+# These only ever look at one row per generation (see HistoryStore.summary), so they open instantly
+# no matter how big the population was or how many generations we ran
+
+def plot_weight_means(summary:dict, weights:list=None) -> go.Figure:
+    """
+    Mean of each weight over the generations, with a +-1 std band around it.
+    """
+    weights = list(summary["weights"]) if weights is None else weights
+    fig = go.Figure()
+    for name in weights:
+        i = summary["weights"].index(name)
+        mean, std = summary["mean"][:, i], summary["std"][:, i]
+        fig.add_trace(go.Scatter(x=summary["generation"], y=mean, mode="lines", name=name, legendgroup=name))
+        fig.add_trace(go.Scatter(
+            x=np.concatenate([summary["generation"], summary["generation"][::-1]]),
+            y=np.concatenate([mean + std, (mean - std)[::-1]]),
+            fill="toself", opacity=0.2, line={"width": 0}, hoverinfo="skip", showlegend=False, legendgroup=name))
+    fig.update_layout(title="Weight mean +- std per generation", xaxis_title="Generation", yaxis_title="Weight")
+    return fig
+
+
+def plot_weight_quantiles(summary:dict, weight:str) -> go.Figure:
+    """
+    The quantiles of a single weight over the generations (the median being the thick one).
+    """
+    i = summary["weights"].index(weight)
+    fig = go.Figure()
+    for q, level in enumerate(summary["quantile_levels"]):
+        fig.add_trace(go.Scatter(
+            x=summary["generation"], y=summary["quantiles"][:, i, q], mode="lines", name=f"q{level:g}",
+            line={"width": 3 if level == 0.5 else 1}))
+    fig.update_layout(title=f"{weight} quantiles per generation", xaxis_title="Generation", yaxis_title=weight)
+    return fig
+
+
+def plot_weight_histogram(summary:dict, weight:str) -> go.Figure:
+    """
+    Heatmap of a single weight's distribution, generation on x and weight value bins on y.
+    """
+    i = summary["weights"].index(weight)
+    edges = np.asarray(summary["hist_edges"])
+    fig = px.imshow(
+        summary["hist"][:, i, :].T,
+        x=summary["generation"],
+        y=(edges[:-1] + edges[1:]) / 2,
+        origin="lower",
+        aspect="auto",
+        labels={"x": "Generation", "y": weight, "color": "Bots"},
+        title=f"{weight} distribution per generation")
+    return fig
+
+
+def plot_fitness_correlation(summary:dict) -> go.Figure:
+    """
+    Heatmap of how strongly each weight correlates with fitness, per generation.
+    """
+    fig = px.imshow(
+        summary["fitness_corr"].T,
+        x=summary["generation"],
+        y=list(summary["weights"]),
+        zmin=-1, zmax=1,
+        color_continuous_scale="RdBu",
+        aspect="auto",
+        labels={"x": "Generation", "color": "Correlation"},
+        title="Correlation of each weight with fitness")
+    return fig
+
+
+##############
+## SCRIPT ####
+##############
+
+# Where to read the run from: a history store directory, or an old history.csv / history.zip (streamed, never fully in RAM)
+source = "history"
+generations = None # Inclusive (first, last) range, None for all of them
+weight_columns = list(WEIGHT_NAMES) # Trim this down to look at just a few weights, loading gets faster too
+show_full_scatter = False # The every-bot-every-weight scatter, very slow for big runs
+
+if __name__ == "__main__":
+    summary = load_summary(source, generations)
+    plot_weight_means(summary, weight_columns).show()
+    plot_fitness_correlation(summary).show()
+    plot_weight_histogram(summary, weight_columns[0]).show()
+    plot_weight_quantiles(summary, weight_columns[0]).show()
+
+    if show_full_scatter:
+        df = load_dataframe(source, generations=generations, weights=weight_columns)
+
+        # Fitness per weight
+        fig = px.scatter(
+            df,
+            x=weight_columns,
+            y="fitness",
+            animation_frame="generation"
+        )
+        fig.show()